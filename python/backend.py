@@ -1,9 +1,22 @@
+from contextlib import asynccontextmanager
+import asyncio
+import importlib
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import ValidationError
-from conceptual_understanding import TutorInput, extract_text_from_pdf, clean_output, manual_prompt, pdf_prompt, model
+import service_path  # noqa: F401  (makes storage/app/python importable)
+from concurrency import generation_limiter, run_in_pdf_pool
+from metrics import render_metrics, stage
 
-app = FastAPI()
+# conceptual_understanding pulls in langchain and builds the model; it is imported in the
+# background after startup (and on the first request at the latest) so the worker is ready sooner
+@asynccontextmanager
+async def lifespan(app):
+    asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "conceptual_understanding")
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS so frontend can call backend
 app.add_middleware(
@@ -16,19 +29,31 @@ app.add_middleware(
 @app.post("/api/tutor")
 async def tutor_api(request: Request):
     try:
+        from conceptual_understanding import TutorInput, extract_text_from_pdf, clean_output, manual_prompt, pdf_prompt, model
+
         data = await request.json()
 
         if data["input_type"] == "pdf":
-            data["topic"] = extract_text_from_pdf(data["pdf_path"])
+            with stage("pdf_parse"):
+                data["topic"] = await run_in_pdf_pool(extract_text_from_pdf, data["pdf_path"])
 
         user_input = TutorInput(**data)
 
         chain = pdf_prompt | model if data["input_type"] == "pdf" else manual_prompt | model
-        result = chain.invoke(user_input.model_dump())
+        async with generation_limiter.slot():
+            with stage("generation"):
+                result = await chain.ainvoke(user_input.model_dump())
 
-        return {"output": clean_output(result)}
+        with stage("clean_output"):
+            output = clean_output(result)
+        return {"output": output}
 
     except ValidationError as ve:
         return {"error": ve.errors()}
     except Exception as e:
         return {"error": str(e)}
+
+# Same Prometheus metrics as the tutor service
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,9 +1,9 @@
 from pydantic import BaseModel, Field, ValidationError
-from langchain_ollama import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.document_loaders import PyPDFLoader
-import os
-import re
+import service_path  # noqa: F401  (makes storage/app/python importable)
+from llm_registry import get_llm
+from pdf_extract import extract_pages_from_path
+from postprocess import clean_output
 
 # -------------------------------
 # Pydantic Model
@@ -46,7 +46,7 @@ Your task is to explain the topic in a way that suits the student's level, using
 # -------------------------------
 # LangChain Setup
 # -------------------------------
-model = OllamaLLM(model="gemma3")
+model = get_llm("gemma3")
 
 manual_prompt = ChatPromptTemplate.from_template(manual_topic_template)
 pdf_prompt = ChatPromptTemplate.from_template(pdf_topic_template)
@@ -55,19 +55,8 @@ pdf_prompt = ChatPromptTemplate.from_template(pdf_topic_template)
 # Load PDF Content
 # -------------------------------
 def extract_text_from_pdf(path: str) -> str:
-    if not os.path.exists(path):
-        raise FileNotFoundError("PDF file not found.")
-    loader = PyPDFLoader(path)
-    pages = loader.load()
-    return " ".join([page.page_content for page in pages[:2]])  # Limit to first 2 pages
-
-def clean_output(text: str) -> str:
-    # Remove bold and italic markers (e.g., **text**, *text*)
-    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
-    text = re.sub(r"\*(.*?)\*", r"\1", text)
-    # Remove leading bullet points and extra whitespace
-    text = re.sub(r"^\s*[\*\-]\s*", "", text, flags=re.MULTILINE)
-    return text.strip()
+    pages = extract_pages_from_path(path, start=0, limit=2)  # Only the first 2 pages are parsed
+    return " ".join(pages)
 
 
 
@@ -0,0 +1,57 @@
+# python/service_client.py
+# The leveler, rewriter, summarizer and proofreader run inside the tutor service
+# (storage/app/python/main.py); the interactive scripts in this folder call it over HTTP.
+
+import contextlib
+import json
+import os
+import requests
+
+SERVICE_URL = os.getenv("TUTOR_SERVICE_URL", "http://127.0.0.1:8000").rstrip("/")
+# Seconds to wait for a connection; a generation itself may take as long as it needs
+CONNECT_TIMEOUT = float(os.getenv("TUTOR_CONNECT_TIMEOUT", "5"))
+
+
+class ServiceError(Exception):
+    pass
+
+
+def check_response(response):
+    if response.status_code != 200:
+        try:
+            detail = response.json().get("detail")
+        except ValueError:
+            detail = response.text
+        raise ServiceError(f"{response.status_code}: {detail}")
+
+
+# POST form fields, and the PDF at pdf_path if given, to an agent endpoint; returns the `key`
+# field of its response (the output text, or the list of "variants"), or all of it for key=None
+def call_agent(path: str, fields: dict, pdf_path: str = None, key: str = "output"):
+    url = f"{SERVICE_URL}{path}"
+    if pdf_path:
+        with open(pdf_path, "rb") as f:
+            files = {"pdf_file": (os.path.basename(pdf_path), f, "application/pdf")}
+            response = requests.post(url, data=fields, files=files, timeout=(CONNECT_TIMEOUT, None))
+    else:
+        response = requests.post(url, data=fields, timeout=(CONNECT_TIMEOUT, None))
+
+    check_response(response)
+    return response.json()[key] if key is not None else response.json()
+
+
+# Same for an endpoint that streams NDJSON: yields each line's object as it arrives
+def stream_agent(path: str, fields: dict, pdf_path: str = None):
+    url = f"{SERVICE_URL}{path}"
+    with contextlib.ExitStack() as stack:
+        files = None
+        if pdf_path:
+            f = stack.enter_context(open(pdf_path, "rb"))
+            files = {"pdf_file": (os.path.basename(pdf_path), f, "application/pdf")}
+        response = stack.enter_context(
+            requests.post(url, data=fields, files=files, stream=True, timeout=(CONNECT_TIMEOUT, None))
+        )
+        check_response(response)
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
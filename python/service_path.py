@@ -0,0 +1,11 @@
+# python/service_path.py
+# Importing this module makes the shared service modules in storage/app/python
+# (concurrency, pdf extraction, ...) importable from the scripts in this folder.
+
+import os
+import sys
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "storage", "app", "python"))
+
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
@@ -1,30 +1,17 @@
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
-
-# Prompt template for proofreading
-Template = """
-You are a professional proofreader. Proofread the following text and:
-1. Correct grammar errors
-2. Fix spelling mistakes
-3. Adjust punctuation
-4. Improve clarity while preserving the meaning
-5. Return the corrected version and a list of changes
-
-Text:
-{input_text}
-
-Respond in this format:
-Corrected text:
-[Your corrected version]
-
-Changes made:
-[List of major changes]
-"""
-
-# Load model from Ollama
-model = OllamaLLM(model="llama3.1")  
-prompt = ChatPromptTemplate.from_template(Template)
-chain = prompt | model
+# Thin client of POST /proofread on the tutor service (storage/app/python/text_agents.py)
+from service_client import call_agent
+
+# "Changes made" list from the word-level changes the service computes
+def format_changes(changes: list) -> str:
+    lines = []
+    for change in changes:
+        if change["type"] == "insert":
+            lines.append(f"- Paragraph {change['paragraph']}: added \"{change['corrected']}\"")
+        elif change["type"] == "delete":
+            lines.append(f"- Paragraph {change['paragraph']}: removed \"{change['original']}\"")
+        else:
+            lines.append(f"- Paragraph {change['paragraph']}: \"{change['original']}\" -> \"{change['corrected']}\"")
+    return "\n".join(lines) or "No changes."
 
 # App loop
 def run_proofreader():
@@ -43,9 +30,12 @@ def run_proofreader():
             continue
 
         try:
-            result = chain.invoke({"input_text": user_input})
+            result = call_agent("/proofread", {"text": user_input}, key=None)
             print("\n=== Proofreading Result ===")
-            print(result)
+            print("Corrected text:")
+            print(result["output"])
+            print("\nChanges made:")
+            print(format_changes(result["changes"]))
             print("===========================\n")
         except Exception as e:
             print(f"Error: {e}")
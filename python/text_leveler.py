@@ -1,47 +1,68 @@
-from langchain_community.llms import Ollama  # type: ignore
-from langchain_core.prompts import ChatPromptTemplate   # type: ignore  
-from langchain_community.document_loaders.pdf import PyPDFLoader  # type: ignore
+# Thin client of POST /level on the tutor service (storage/app/python/text_agents.py)
+import json
+import os
+from service_client import call_agent, stream_agent
 
-# Prompt template for adaptive content only
-template = """
-You are an assistant who explains book content in a way suitable for the learner.
+# Where the progress through a PDF is saved, so an interrupted run continues where it stopped
+def checkpoint_path(pdf_path: str) -> str:
+    return pdf_path + ".level-checkpoint.json"
 
-Parameters:
-- Grade level: {grade_level}
-- Learning speed: {learning_speed}
+# Explain a whole PDF section by section, printing each section as soon as the service sends it.
+# After every section its "resume" cursor is saved; a later run with the same settings resumes there.
+def explain_sections(pdf_path: str, grade_level: str, learning_speed: str, pages: str = ""):
+    settings = {"grade_level": grade_level, "learning_speed": learning_speed, "pages": pages}
+    checkpoint = checkpoint_path(pdf_path)
+    resume = ""
+    if os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            saved = json.load(f)
+        if saved.get("settings") == settings:
+            resume = saved["resume"]
+            print(f"Resuming at section {resume.split(':')[0]} (delete {checkpoint} to start over)")
 
-Task:
-Based on the input text below, provide a clear, detailed explanation that matches the learner's grade level and learning speed.
+    for section in stream_agent("/level/sections", {**settings, "resume": resume}, pdf_path):
+        if section.get("done"):
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
+            print(f"\nDone: {section['sections']} sections.")
+            return
+        if "error" in section:
+            print(f"\nStopped: {section['error']} (run again to resume)")
+            return
+        first, last = section["pages"]
+        print(f"\n--- Section {section['section']} (pages {first}-{last}) ---")
+        print(section["output"])
+        with open(checkpoint, "w") as f:
+            json.dump({"settings": settings, "resume": section["resume"]}, f)
 
-Do NOT summarize the text. Instead, explain the content thoroughly, using examples or simple language if needed to make it easier to understand.
+def get_adaptive_content(context: str, grade_level: str, learning_speed: str, pdf_path: str = None, pages: str = ""):
+    # Several comma-separated grade levels or speeds are generated together in one request
+    if "," in grade_level or "," in learning_speed:
+        variants = call_agent(
+            "/level/variants",
+            {"text": context, "grade_levels": grade_level, "learning_speeds": learning_speed, "pages": pages},
+            pdf_path,
+            key="variants",
+        )
+        for variant in variants:
+            print(f"\nAdapted Explanation ({variant['grade_level']}, {variant['learning_speed']}):")
+            print(variant.get("output", f"failed: {variant.get('error')}"))
+        return
 
-Input text: "{context}"
+    # A PDF is explained section by section, so long books start printing right away
+    if pdf_path:
+        explain_sections(pdf_path, grade_level, learning_speed, pages)
+        return
 
-Respond ONLY with the explanation text (no extra text).
-"""
-
-model = Ollama(model="llama3")
-prompt = ChatPromptTemplate.from_template(template)
-chain = prompt | model
-
-def get_adaptive_content(context: str, grade_level: str, learning_speed: str):
-    response = chain.invoke({
-        "context": context,
-        "grade_level": grade_level,
-        "learning_speed": learning_speed
-    })
+    response = call_agent(
+        "/level",
+        {"text": context, "grade_level": grade_level, "learning_speed": learning_speed, "pages": pages},
+        pdf_path,
+    )
     # The response content is the adapted explanation string
     print("\nAdapted Explanation:")
     print(response)
 
-def load_pdf_content(pdf_path: str) -> str:
-    loader = PyPDFLoader(pdf_path)
-    # This returns a list of Document objects, each with .page_content
-    documents = loader.load()
-    # Join the text from all pages into one big string
-    full_text = "\n".join(doc.page_content for doc in documents)
-    return full_text
-
 if __name__ == "__main__":
     print("Adaptive Content Chatbot (type 'exit' to quit)\n")
 
@@ -51,19 +72,19 @@ if __name__ == "__main__":
             print("Goodbye!")
             break
 
+        pdf_path = None
+        page_range = ""
         if user_input.lower() == "pdf":
             pdf_path = input("Enter the path to the PDF file: ").strip()
-            try:
-                pdf_text = load_pdf_content(pdf_path)
-                print(f"Loaded PDF content ({len(pdf_text)} characters).")
-                context = pdf_text
-            except Exception as e:
-                print(f"Failed to load PDF: {e}")
-                continue
+            page_range = input("Pages to use (e.g. 1-10, press Enter for all): ").strip()
+            context = ""
         else:
             context = user_input
 
-        grade_level = input("Enter grade level (kinder, elementary, middle, high, college): ").strip().lower()
-        learning_speed = input("Enter learning speed (slow, average, fast): ").strip().lower()
+        grade_level = input("Enter grade level (kinder, elementary, middle, high, college; comma-separate several): ").strip().lower()
+        learning_speed = input("Enter learning speed (slow, average, fast; comma-separate several): ").strip().lower()
 
-        get_adaptive_content(context, grade_level, learning_speed)
\ No newline at end of file
+        try:
+            get_adaptive_content(context, grade_level, learning_speed, pdf_path, page_range)
+        except Exception as e:
+            print(f"Failed: {e}")
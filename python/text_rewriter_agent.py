@@ -1,26 +1,12 @@
-from langchain_core.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
-from langchain_community.document_loaders.pdf import PyPDFLoader
+# Thin client of POST /rewrite on the tutor service (storage/app/python/text_agents.py)
 import os
-
-# Use the updated OllamaLLM class
-llm = OllamaLLM(model="llama3")
-
-prompt = PromptTemplate.from_template(
-    "You are an assistant who rewrites content to suit different types of learners.\n\n"
-    "Learner Type: {learner_type}\n"
-    "Task: Rewrite the following input text so that it is easier to understand for this learner type.\n\n"
-    "Input Text:\n{input_text}\n\n"
-    "Output only the rewritten version without any explanation or comments."
-)
-
-chain = prompt | llm
+from service_client import call_agent
 
 print("Text Rewriter\nType 'exit' to quit.\n")
 
 while True:
     mode = input("Enter 'text' to input manually or 'pdf' to load from a PDF: ").lower()
-    
+
     if mode == "exit":
         break
 
@@ -28,30 +14,34 @@ while True:
         text = input("Text: ")
         if text.lower() == "exit":
             break
+        file_path = None
+        page_range = ""
 
     elif mode == "pdf":
         file_path = input("Enter PDF file path: ").strip()
         if not os.path.exists(file_path):
             print("File not found.\n")
             continue
-        try:
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
-            text = "\n".join([page.page_content for page in pages])
-            print(f"\nPDF loaded successfully. {len(pages)} pages extracted.\n")
-        except Exception as e:
-            print(f"Failed to load PDF: {e}")
-            continue
+        page_range = input("Pages to use (e.g. 1-10, press Enter for all): ").strip()
+        text = ""
 
     else:
         print("Invalid option. Type 'text', 'pdf', or 'exit'.\n")
         continue
 
-    level = input("Level (slow/average/fast): ").lower()
-    if level not in ["slow", "average", "fast"]:
+    level = input("Level (slow/average/fast, or 'all' for every level): ").lower()
+    if level not in ["slow", "average", "fast", "all"]:
         print("Invalid level\n")
         continue
 
-    learner = f"{level} learner"
-    result = chain.invoke({"learner_type": learner, "input_text": text})
-    print("\nRewritten:\n" + result + "\n")
+    try:
+        if level == "all":
+            # One request: the service reads the document once and writes all three versions at the same time
+            variants = call_agent("/rewrite/variants", {"text": text, "pages": page_range}, file_path, key="variants")
+        else:
+            variants = [{"level": level, "output": call_agent("/rewrite", {"text": text, "level": level, "pages": page_range}, file_path)}]
+    except Exception as e:
+        print(f"Failed: {e}\n")
+        continue
+    for variant in variants:
+        print(f"\nRewritten ({variant['level']}):\n" + variant.get("output", f"failed: {variant.get('error')}") + "\n")
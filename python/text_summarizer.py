@@ -1,73 +1,66 @@
-from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.document_loaders import PyPDFLoader
 import os
+from service_client import call_agent
 
-# Step 1: Choose input type
-input_type = input("Input type? ('text' or 'pdf'): ").strip().lower()
+# -------------------------------
+# Service calls
+# -------------------------------
+# Chunking and the map-reduce summary run in the tutor service (storage/app/python/text_agents.py);
+# this script only sends the text or PDF to POST /summarize
+def summarize_text(text: str, conditions: str) -> str:
+    return call_agent("/summarize", {"text": text, "conditions": conditions})
 
-if input_type == "pdf":
-    pdf_path = input("📎 Enter path to PDF file: ").strip().strip('"')
-    if not os.path.isfile(pdf_path):
-        print("File not found. Please check the path.")
-        exit()
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load()
-    text = "\n".join([page.page_content for page in pages])
-else:
-    text = input("Paste your text to summarize:\n\n").strip()
+def summarize_pdf(pdf_path: str, conditions: str, pages: str = "") -> str:
+    return call_agent("/summarize", {"conditions": conditions, "pages": pages}, pdf_path)
 
-# Step 2: Set initial summary conditions
-conditions = input("Enter summary conditions (e.g., 1 paragraph, 5 bullet points, 300 words): ").strip()
+# -------------------------------
+# Main Interactive Loop
+# -------------------------------
+def main():
+    # Step 1: Choose input type
+    input_type = input("Input type? ('text' or 'pdf'): ").strip().lower()
 
-# Step 3: Define reusable prompt template
-template = """
-You are an intelligent and concise summarization assistant.
-
-Your task is to read the content below and generate a summary that follows the user's specific request.
-
-------------------------
-Content:
-{text}
-
-Summary Instructions:
-{conditions}
-------------------------
-
-Please follow the instructions carefully and provide only the summary.
-"""
-prompt = PromptTemplate.from_template(template)
-llm = Ollama(model="gemma3:4b")
-# Chain using RunnableSequence (no LLMChain)
-chain = prompt | llm
+    if input_type == "pdf":
+        pdf_path = input("📎 Enter path to PDF file: ").strip().strip('"')
+        if not os.path.isfile(pdf_path):
+            print("File not found. Please check the path.")
+            return
+        summarize = lambda conditions: summarize_pdf(pdf_path, conditions)
+    else:
+        text = input("Paste your text to summarize:\n\n").strip()
+        summarize = lambda conditions: summarize_text(text, conditions)
 
-# Then run using `.invoke()` with your inputs
-response = chain.invoke({"text": text, "conditions": conditions})
+    # Step 2: Set initial summary conditions
+    conditions = input("Enter summary conditions (e.g., 1 paragraph, 5 bullet points, 300 words): ").strip()
 
+    # Step 3: Summary loop
+    while True:
+        # Run the summary
+        try:
+            response = summarize(conditions)
+        except Exception as e:
+            print(f"Failed: {e}")
+            return
+        print("\nSummary:\n")
+        print(response)
 
-# Step 4: Summary loop
-while True:
-    # Run the summary
-    response = chain.run(text=text, conditions=conditions)
-    print("\nSummary:\n")
-    print(response.strip())
+        # Ask user if they want to run again
+        next_action = input(
+            "\nWould you like to summarize again with updated conditions? (add / replace / keep / exit): "
+        ).strip().lower()
 
-    # Ask user if they want to run again
-    next_action = input(
-        "\nWould you like to summarize again with updated conditions? (add / replace / keep / exit): "
-    ).strip().lower()
+        if next_action == "add":
+            extra = input("Enter additional condition(s) to add: ").strip()
+            conditions = conditions + "; " + extra
+        elif next_action == "replace":
+            conditions = input("Enter new condition(s) to replace the old ones: ").strip()
+        elif next_action == "keep":
+            print("Reusing existing conditions.")
+            continue
+        elif next_action == "exit":
+            print("Exiting. Thank you!")
+            break
+        else:
+            print("Invalid option. Please type 'add', 'replace', 'keep', or 'exit'.")
 
-    if next_action == "add":
-        extra = input("Enter additional condition(s) to add: ").strip()
-        conditions = conditions + "; " + extra
-    elif next_action == "replace":
-        conditions = input("Enter new condition(s) to replace the old ones: ").strip()
-    elif next_action == "keep":
-        print("Reusing existing conditions.")
-        continue
-    elif next_action == "exit":
-        print("Exiting. Thank you!")
-        break
-    else:
-        print("Invalid option. Please type 'add', 'replace', 'keep', or 'exit'.")
+if __name__ == "__main__":
+    main()
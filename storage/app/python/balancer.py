@@ -0,0 +1,162 @@
+# storage/app/python/balancer.py
+
+import asyncio
+import itertools
+import time
+import httpx
+from langchain_core.runnables import Runnable
+
+# Errors after which a request is retried on another node: the node could not be
+# reached, dropped the connection or timed out
+RETRYABLE_ERRORS = (ConnectionError, httpx.TransportError)
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0
+        self.down_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "failures": self.failures,
+        }
+
+
+# Set of Ollama nodes with least-outstanding-requests selection.
+# A node that fails is skipped for `cooldown` seconds; the health check loop
+# brings it back as soon as it answers again.
+class BackendPool:
+    def __init__(self, urls, cooldown=10.0, health_interval=10.0):
+        self.backends = [Backend(url) for url in urls]
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self._turn = itertools.count()
+        self._health_task = None
+
+    def pick(self, exclude=()) -> Backend:
+        candidates = [b for b in self.backends if b.url not in exclude] or self.backends
+        healthy = [b for b in candidates if b.healthy]
+        if not healthy:
+            # Everything is marked down: try the node that has been down the longest
+            return min(candidates, key=lambda b: b.down_until)
+        fewest = min(b.outstanding for b in healthy)
+        tied = [b for b in healthy if b.outstanding == fewest]
+        return tied[next(self._turn) % len(tied)]
+
+    def mark_failed(self, backend: Backend):
+        backend.failures += 1
+        backend.down_until = time.monotonic() + self.cooldown
+
+    def mark_ok(self, backend: Backend):
+        backend.down_until = 0.0
+
+    def status(self) -> list:
+        return [backend.to_dict() for backend in self.backends]
+
+    async def check_health(self):
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            async def check(backend):
+                try:
+                    response = await client.get(f"{backend.url.rstrip('/')}/api/version")
+                    response.raise_for_status()
+                    self.mark_ok(backend)
+                except Exception:
+                    self.mark_failed(backend)
+
+            await asyncio.gather(*(check(backend) for backend in self.backends))
+
+    def start_health_checks(self):
+        if self._health_task is None and len(self.backends) > 1:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop_health_checks(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+
+# Drop-in replacement for an OllamaLLM in a chain (`prompt | llm`) that sends every call
+# to the least busy healthy node and retries on another node after connection errors.
+# `client_for(url)` returns the per-node OllamaLLM.
+class BalancedLLM(Runnable):
+    def __init__(self, model: str, pool: BackendPool, client_for, retries: int = 2):
+        self.model = model
+        self.pool = pool
+        self.client_for = client_for
+        self.retries = retries
+
+    # Generation settings (temperature, num_ctx, ...) are the same on every node
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("model", "pool", "client_for", "retries"):
+            raise AttributeError(name)
+        return getattr(self.client_for(self.pool.backends[0].url), name)
+
+    def invoke(self, input, config=None, **kwargs):
+        tried = set()
+        while True:
+            backend = self.pool.pick(exclude=tried)
+            backend.outstanding += 1
+            try:
+                result = self.client_for(backend.url).invoke(input, config, **kwargs)
+                self.pool.mark_ok(backend)
+                return result
+            except RETRYABLE_ERRORS:
+                self.pool.mark_failed(backend)
+                tried.add(backend.url)
+                if len(tried) > self.retries:
+                    raise
+            finally:
+                backend.outstanding -= 1
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        tried = set()
+        while True:
+            backend = self.pool.pick(exclude=tried)
+            backend.outstanding += 1
+            try:
+                result = await self.client_for(backend.url).ainvoke(input, config, **kwargs)
+                self.pool.mark_ok(backend)
+                return result
+            except RETRYABLE_ERRORS:
+                self.pool.mark_failed(backend)
+                tried.add(backend.url)
+                if len(tried) > self.retries:
+                    raise
+            finally:
+                backend.outstanding -= 1
+
+    # A stream is only moved to another node while nothing has been sent to the caller yet
+    async def astream(self, input, config=None, **kwargs):
+        tried = set()
+        while True:
+            backend = self.pool.pick(exclude=tried)
+            backend.outstanding += 1
+            started = False
+            try:
+                async for chunk in self.client_for(backend.url).astream(input, config, **kwargs):
+                    started = True
+                    yield chunk
+                self.pool.mark_ok(backend)
+                return
+            except RETRYABLE_ERRORS:
+                self.pool.mark_failed(backend)
+                tried.add(backend.url)
+                if started or len(tried) > self.retries:
+                    raise
+            finally:
+                backend.outstanding -= 1
@@ -0,0 +1,117 @@
+# storage/app/python/benchmarks/clean_bench.py
+#
+# Checks postprocess.clean_output against the original three-regex clean_output on a
+# fixture corpus (hand-written tutor answers, edge cases and random marker soup, each
+# also fed to StreamCleaner in random chunks), then times both on large outputs.
+#
+#   cd storage/app/python && python benchmarks/clean_bench.py --size-kb 200
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from postprocess import StreamCleaner, clean_output  # noqa: E402
+
+
+# clean_output as it was in tutor_agent.py / conceptual_understanding.py
+def legacy_clean_output(text: str) -> str:
+    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
+    text = re.sub(r"\*(.*?)\*", r"\1", text)
+    text = re.sub(r"^\s*[\*\-]\s*", "", text, flags=re.MULTILINE)
+    return text.strip()
+
+
+TUTOR_ANSWER = """
+**1. Core Concept Explanation:**
+
+* **Definition:** Photosynthesis is how plants make their *own* food.
+* Think of a leaf as a tiny **kitchen**:
+    - Sunlight is the *stove*
+    - Chlorophyll is the **cook**
+
+**2. Why it Matters - It's Significance/Application:**
+
+- Oxygen we breathe comes from it.
+-   Farming depends on it; 3 * 4 = 12 is *not* related.
+
+*   **Misconception:** "Plants eat soil." *Clarification:* they build sugar from CO2.
+"""
+
+FIXTURES = [
+    TUTOR_ANSWER,
+    "",
+    "   \n\n  ",
+    "plain text without markers",
+    "**unbalanced bold\nand *unbalanced italic",
+    "***triple*** and ****quad**** markers",
+    "-\n\n  - nested bullet after a bare one",
+    "- \n\nText after a bullet swallowed the blank lines",
+    "line with trailing spaces   \n\n\n- bullet after blank lines",
+    "* * * *",
+    "a * b * c * d",
+    "\t- tab bullet\n\t* star bullet\n\tnot a bullet",
+]
+
+MARKER_SOUP = ["*", "**", "-", " ", "\n", "a", "b", "\t", "\n\n", "- ", "* ", "  "]
+
+
+def corpus(seed=7, random_cases=20000):
+    rng = random.Random(seed)
+    cases = list(FIXTURES)
+    for _ in range(random_cases):
+        cases.append("".join(rng.choice(MARKER_SOUP) for _ in range(rng.randint(0, 24))))
+    return cases
+
+
+def check_corpus() -> int:
+    rng = random.Random(11)
+    for text in corpus():
+        expected = legacy_clean_output(text)
+        assert clean_output(text) == expected, repr(text)
+        cleaner = StreamCleaner()
+        pieces = []
+        pos = 0
+        while pos < len(text):
+            step = rng.randint(1, 6)
+            pieces.append(cleaner.feed(text[pos:pos + step]))
+            pos += step
+        pieces.append(cleaner.flush())
+        assert "".join(pieces) == expected, repr(text)
+    return len(corpus())
+
+
+def timed(func, text, repeat) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="clean_output equivalence check and microbenchmark")
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"fixture corpus: {check_corpus()} cases match the original clean_output (whole text and streamed)")
+
+    size = args.size_kb * 1024
+    workloads = {
+        "tutor answers": (TUTOR_ANSWER * (size // len(TUTOR_ANSWER) + 1))[:size],
+        "one long line, unbalanced *": ("word *" * (size // 6))[:size],
+        "blank lines before text": "\n" * (size // 20) + "text",
+    }
+    print(f"\n{'workload (' + str(args.size_kb) + ' KB)':<32} {'legacy ms':>10} {'new ms':>10} {'speedup':>8}")
+    for name, text in workloads.items():
+        assert clean_output(text) == legacy_clean_output(text)
+        legacy = timed(legacy_clean_output, text, args.repeat)
+        new = timed(clean_output, text, args.repeat)
+        print(f"{name:<32} {legacy:>10.2f} {new:>10.2f} {legacy / new:>7.1f}x")
@@ -0,0 +1,235 @@
+# storage/app/python/benchmarks/fake_ollama.py
+#
+# Minimal stand-in for the Ollama HTTP API used by the benchmarks (generate, chat, embed).
+# Responses are deterministic and every generated token costs `token_delay`
+# seconds, so results depend on the service under test and not on a real model.
+#
+#   python benchmarks/fake_ollama.py --port 11500 --token-delay 0.02
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "Photosynthesis is the process plants use to turn light water and carbon dioxide "
+    "into sugar and oxygen . Think of a leaf as a small **kitchen** where sunlight "
+    "is the *stove* and chlorophyll is the cook ."
+).split()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Deterministic list of tokens for a prompt, so the same prompt always gets the same answer
+def fake_tokens(prompt: str, count: int) -> list:
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    return [WORDS[(seed + i) % len(WORDS)] + " " for i in range(count)]
+
+
+# Deterministic bag-of-words embedding: texts sharing words get similar vectors
+def fake_embedding(text: str, dimensions: int = 64) -> list:
+    vector = [0.0] * dimensions
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.strip(".,;:!?()").encode("utf-8")).hexdigest(), 16) % dimensions] += 1.0
+    return vector
+
+
+class FakeOllamaServer:
+    def __init__(self, host="127.0.0.1", port=0, token_delay=0.01, num_tokens=32, prompt_delay=0.0, slots=0):
+        self.token_delay = token_delay
+        self.num_tokens = num_tokens
+        self.prompt_delay = prompt_delay
+        self.requests = 0
+        self.embedded = 0
+        self.aborted = 0  # generations whose client hung up before the end
+        self.options = []  # options of every generation request, in arrival order
+        self.missing_models = set()  # models answered with 404, like ones that were never pulled
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        # slots > 0 makes the server behave like a CPU node that only runs that many generations at once
+        self._slots = threading.Semaphore(slots) if slots else None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": []})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                if self.path == "/api/generate":
+                    self._generate(chat=False)
+                elif self.path == "/api/chat":
+                    self._generate(chat=True)
+                elif self.path == "/api/embed":
+                    request = self._read_json()
+                    if request.get("model", "") in server.missing_models:
+                        self._send_json({"error": f"model \"{request['model']}\" not found, try pulling it first"}, status=404)
+                        return
+                    texts = request.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    with server._lock:
+                        server.embedded += len(texts)
+                    self._send_json({"model": request.get("model", ""), "embeddings": [fake_embedding(t) for t in texts]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _generate(self, chat):
+                request = self._read_json()
+                if chat:
+                    prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+                else:
+                    prompt = request.get("prompt", "")
+                options = request.get("options") or {}
+                with server._lock:
+                    server.options.append(options)
+                # Answers are num_tokens long; num_predict caps them, like it caps the real server's
+                count = server.num_tokens
+                if (options.get("num_predict") or -1) > 0:
+                    count = min(count, options["num_predict"])
+                # An empty prompt only loads the model, like the real server
+                tokens = fake_tokens(prompt, count) if prompt else []
+                prompt_tokens = max(1, len(prompt) // 4)
+
+                if server._slots is not None:
+                    server._slots.acquire()
+                server._enter()
+                started = time.perf_counter()
+                try:
+                    time.sleep(server.prompt_delay)
+                    prompt_done = time.perf_counter()
+                    if request.get("stream", True):
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        for token in tokens:
+                            time.sleep(server.token_delay)
+                            self._write_chunk(self._part(request, chat, token, done=False))
+                        final = self._final(request, chat, "", started, prompt_done, prompt_tokens, len(tokens))
+                        self._write_chunk(final)
+                        self.wfile.write(b"0\r\n\r\n")
+                    else:
+                        time.sleep(server.token_delay * len(tokens))
+                        final = self._final(request, chat, "".join(tokens), started, prompt_done, prompt_tokens, len(tokens))
+                        self._send_json(final)
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.aborted += 1
+                finally:
+                    server._leave()
+                    if server._slots is not None:
+                        server._slots.release()
+
+            def _part(self, request, chat, text, done):
+                part = {"model": request.get("model", ""), "created_at": _now(), "done": done}
+                if chat:
+                    part["message"] = {"role": "assistant", "content": text}
+                else:
+                    part["response"] = text
+                return part
+
+            def _final(self, request, chat, text, started, prompt_done, prompt_tokens, eval_tokens):
+                ended = time.perf_counter()
+                final = self._part(request, chat, text, done=True)
+                final.update({
+                    "done_reason": "stop",
+                    "total_duration": int((ended - started) * 1e9),
+                    "load_duration": 0,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int((prompt_done - started) * 1e9),
+                    "eval_count": eval_tokens,
+                    "eval_duration": int((ended - prompt_done) * 1e9),
+                })
+                return final
+
+            def _write_chunk(self, payload):
+                line = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds per generated token")
+    parser.add_argument("--prompt-delay", type=float, default=0.0, help="seconds of simulated prompt evaluation")
+    parser.add_argument("--num-tokens", type=int, default=32)
+    parser.add_argument("--slots", type=int, default=0, help="generations served at once (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, args.token_delay, args.num_tokens, args.prompt_delay, args.slots)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,102 @@
+# storage/app/python/benchmarks/load_test.py
+#
+# Fires concurrent /tutor requests at the FastAPI app in main.py while the model
+# is served by the fake Ollama server, and prints throughput per concurrency level.
+# With a non-blocking request path, throughput grows with concurrency up to
+# TUTOR_MAX_IN_FLIGHT instead of staying flat. With --nodes N the app is spread over
+# N fake servers (OLLAMA_HOSTS); give each a --slots capacity to see throughput
+# scale with the number of nodes.
+#
+#   cd storage/app/python && python benchmarks/load_test.py --levels 1 2 4 8
+#   cd storage/app/python && python benchmarks/load_test.py --levels 8 --nodes 3 --slots 2
+
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fake_ollama import FakeOllamaServer  # noqa: E402
+
+
+# One /tutor request; `n` makes every request distinct and the response cache is bypassed,
+# so every request reaches the model
+async def send(client, n: int):
+    response = await client.post("/tutor", data={
+        "grade_level": "11th grade",
+        "input_type": "topic",
+        "topic": f"photosynthesis {n}",
+        "add_cont": "",
+        "bypass_cache": "true",
+    })
+    response.raise_for_status()
+
+
+# `first` numbers the level's requests after those of earlier levels
+async def run_level(client, concurrency: int, requests_per_worker: int, first: int = 0) -> dict:
+    async def worker(worker_id):
+        latencies = []
+        for i in range(requests_per_worker):
+            started = time.perf_counter()
+            await send(client, first + worker_id * requests_per_worker + i)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(l for worker_latencies in results for l in worker_latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2],
+    }
+
+
+async def main(args):
+    import httpx
+
+    with contextlib.ExitStack() as stack:
+        fakes = [
+            stack.enter_context(FakeOllamaServer(token_delay=args.token_delay, num_tokens=args.num_tokens, slots=args.slots))
+            for _ in range(args.nodes)
+        ]
+        os.environ["OLLAMA_HOST"] = fakes[0].url
+        if args.nodes > 1:
+            os.environ["OLLAMA_HOSTS"] = ",".join(fake.url for fake in fakes)
+        os.environ.setdefault("TUTOR_MAX_IN_FLIGHT", str(max(args.levels)))
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"{'concurrency':>11} {'requests':>8} {'seconds':>8} {'req/s':>8} {'p50 s':>7}")
+            # Unmeasured, so the first level does not include the app's deferred imports
+            await send(client, -1)
+            baseline = None
+            first = 0
+            for level in args.levels:
+                row = await run_level(client, level, args.requests, first)
+                first += row["requests"]
+                baseline = baseline or row["throughput"]
+                print(f"{row['concurrency']:>11} {row['requests']:>8} {row['seconds']:>8.2f} "
+                      f"{row['throughput']:>8.2f} {row['p50']:>7.3f}  (x{row['throughput'] / baseline:.1f})")
+        for fake in fakes:
+            print(f"fake Ollama {fake.url} served {fake.requests} requests, at most {fake.max_in_flight} at once")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency load test for /tutor")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=4, help="requests per concurrent client")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--num-tokens", type=int, default=20)
+    parser.add_argument("--nodes", type=int, default=1, help="number of fake Ollama servers")
+    parser.add_argument("--slots", type=int, default=0, help="generations each fake server runs at once (0 = unlimited)")
+    asyncio.run(main(parser.parse_args()))
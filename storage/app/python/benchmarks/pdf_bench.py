@@ -0,0 +1,80 @@
+# storage/app/python/benchmarks/pdf_bench.py
+#
+# Per-request PDF cost of the tutor pipeline: the old path (tempfile + PyPDFLoader.load
+# of every page) against pdf_extract on a cold cache and on a repeat upload of the
+# same file, for documents of increasing length.
+#
+#   cd storage/app/python && python benchmarks/pdf_bench.py --pages 10 100 300
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from sample_pdf import make_sample_pdf  # noqa: E402
+
+
+def old_extract(data: bytes) -> str:
+    from langchain_community.document_loaders import PyPDFLoader
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(data)
+        tmp_path = tmp.name
+    pages = PyPDFLoader(tmp_path).load()
+    os.unlink(tmp_path)
+    return " ".join([page.page_content for page in pages[:2]])
+
+
+# The page window the tutor sends for an upload, extracted the way the service does it
+def new_extract(data: bytes) -> str:
+    from pdf_extract import extract_pages_from_file
+    from tutor_agent import PDF_PAGES, PDF_START_PAGE
+
+    return " ".join(extract_pages_from_file(io.BytesIO(data), PDF_START_PAGE, PDF_PAGES))
+
+
+def timed(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def peak_kb(func) -> float:
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF extraction cost per request")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from pdf_extract import page_cache
+
+    print(f"{'pages':>6} {'KB':>6} | {'old ms':>9} {'cold ms':>9} {'cached ms':>9} | {'old peak KB':>11} {'cold peak KB':>12}")
+    for count in args.pages:
+        data = make_sample_pdf(count)
+        assert old_extract(data) == new_extract(data), "extracted text differs from PyPDFLoader"
+
+        def cold():
+            page_cache.clear()
+            new_extract(data)
+
+        old_ms = timed(lambda: old_extract(data), args.repeat)
+        cold_ms = timed(cold, args.repeat)
+        new_extract(data)
+        cached_ms = timed(lambda: new_extract(data), args.repeat)
+        print(f"{count:>6} {len(data) / 1024:>6.0f} | {old_ms:>9.2f} {cold_ms:>9.2f} {cached_ms:>9.2f} | "
+              f"{peak_kb(lambda: old_extract(data)):>11.0f} {peak_kb(cold):>12.0f}")
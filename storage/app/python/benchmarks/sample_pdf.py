@@ -0,0 +1,49 @@
+# storage/app/python/benchmarks/sample_pdf.py
+#
+# Builds text-only PDFs of any length in memory, so the PDF benchmarks need no fixtures.
+#
+#   python benchmarks/sample_pdf.py 300 textbook.pdf
+
+import sys
+
+LINE = "Plants capture light energy in their chloroplasts and store it as sugar for later use."
+
+
+def make_sample_pdf(pages: int = 20, lines_per_page: int = 40) -> bytes:
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(pages):
+        text = [b"BT /F1 10 Tf 40 800 Td 12 TL"]
+        text.append(f"(Chapter {number + 1}) Tj T*".encode("ascii"))
+        for line in range(lines_per_page):
+            text.append(f"({line + 1}. {LINE}) Tj T*".encode("ascii"))
+        text.append(b"ET")
+        stream = b"\n".join(text)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    path = sys.argv[2] if len(sys.argv) > 2 else "sample.pdf"
+    with open(path, "wb") as f:
+        f.write(make_sample_pdf(count))
+    print(f"Wrote {count} pages to {path}")
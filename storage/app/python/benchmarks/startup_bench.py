@@ -0,0 +1,107 @@
+# storage/app/python/benchmarks/startup_bench.py
+#
+# Cold start of the tutor services: how long a fresh uvicorn worker takes until it answers
+# HTTP, its RSS at that moment, and the latency of the first /tutor request against the
+# fake Ollama server (which pays for anything still deferred). With --importtime the
+# `python -X importtime` breakdown of each app's import is printed as well.
+#
+#   cd storage/app/python && python benchmarks/startup_bench.py --runs 5 --importtime
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from suite import APPS, AppServer, rss_kb  # noqa: E402
+from fake_ollama import FakeOllamaServer  # noqa: E402
+
+
+# (module, self ms, cumulative ms) rows of `python -X importtime -c "import <module>"`
+def import_profile(app: str) -> list:
+    cwd, target, _ = APPS[app]
+    module = target.split(":")[0]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[0].strip().isdigit():
+            continue
+        rows.append((parts[2][1:].rstrip(), int(parts[0]) / 1000, int(parts[1]) / 1000))
+    return rows
+
+
+def print_profile(app: str, top: int):
+    rows = import_profile(app)
+    module = APPS[app][1].split(":")[0]
+    total = next((cumulative for name, _, cumulative in rows if name == module), 0.0)
+    print(f"\n{app}: import takes {total:.0f} ms; largest cumulative imports")
+    for name, own, cumulative in sorted(rows, key=lambda row: -row[2])[:top]:
+        print(f"  {cumulative:>8.1f} ms  (self {own:>6.1f})  {name}")
+
+
+async def cold_start(app: str, fake_url: str, warm: bool) -> dict:
+    import httpx
+
+    extra_env = {"OLLAMA_WARM_MODELS": "gemma3" if warm else ""}
+    async with httpx.AsyncClient(timeout=None) as client:
+        started = time.perf_counter()
+        with AppServer(app, fake_url, extra_env) as server:
+            await server.wait_ready(client, interval=0.01)
+            ready = time.perf_counter() - started
+            ready_rss = rss_kb(server.process.pid)
+
+            first_started = time.perf_counter()
+            if app == "backend":
+                response = await client.post(f"{server.url}/api/tutor", json={"grade_level": "5", "input_type": "topic", "topic": "cells"})
+            else:
+                response = await client.post(f"{server.url}/tutor", data={"grade_level": "5", "input_type": "topic", "topic": "cells"})
+            response.raise_for_status()
+            first = time.perf_counter() - first_started
+            return {
+                "ready_s": ready,
+                "ready_rss_kb": ready_rss,
+                "first_request_s": first,
+                "rss_after_first_kb": rss_kb(server.process.pid),
+            }
+
+
+async def main(args):
+    results = {}
+    with FakeOllamaServer(token_delay=0.001, num_tokens=8) as fake:
+        print(f"{'app':<8} {'ready s':>8} {'RSS at ready MB':>16} {'first request s':>16} {'RSS after MB':>13}")
+        for app in args.apps:
+            runs = [await cold_start(app, fake.url, args.warm) for _ in range(args.runs)]
+            summary = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            results[app] = summary
+            print(f"{app:<8} {summary['ready_s']:>8.2f} {summary['ready_rss_kb'] / 1024:>16.1f} "
+                  f"{summary['first_request_s']:>16.2f} {summary['rss_after_first_kb'] / 1024:>13.1f}")
+    print(f"(median of {args.runs} runs)")
+
+    if args.importtime:
+        for app in args.apps:
+            print_profile(app, args.top)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start time and baseline RSS of the tutor services")
+    parser.add_argument("--apps", nargs="+", choices=sorted(APPS), default=sorted(APPS, reverse=True))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="let the service warm up in the background (OLLAMA_WARM_MODELS)")
+    parser.add_argument("--importtime", action="store_true", help="print the -X importtime breakdown")
+    parser.add_argument("--top", type=int, default=15, help="modules shown in the import profile")
+    parser.add_argument("--output", help="write the medians to this JSON file")
+    asyncio.run(main(parser.parse_args()))
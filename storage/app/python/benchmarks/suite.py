@@ -0,0 +1,274 @@
+# storage/app/python/benchmarks/suite.py
+#
+# Reproducible end-to-end benchmark of both FastAPI apps against the fake Ollama server.
+# Each app runs in its own uvicorn process (storage/app/python/main.py and
+# python/backend.py); topic, PDF and batch workloads are driven at every concurrency
+# level and p50/p95/p99 latency, throughput and the server's peak RSS are written to
+# JSON. Pass an earlier result file with --compare to see the change per row.
+#
+#   cd storage/app/python && python benchmarks/suite.py --levels 1 4 8 --output before.json
+#   cd storage/app/python && python benchmarks/suite.py --levels 1 4 8 --compare before.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(HERE)
+REPO_ROOT = os.path.abspath(os.path.join(SERVICE_DIR, "..", "..", ".."))
+sys.path.insert(0, HERE)
+
+from fake_ollama import FakeOllamaServer  # noqa: E402
+from sample_pdf import make_sample_pdf  # noqa: E402
+
+# app name -> (working directory, ASGI app, workloads it supports)
+APPS = {
+    "tutor": (SERVICE_DIR, "main:app", ("topic", "pdf", "batch")),
+    "backend": (os.path.join(REPO_ROOT, "python"), "backend:app", ("topic", "pdf")),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Resident set size of a process in KB, current (VmRSS) or peak (VmHWM); Linux only, None elsewhere
+def rss_kb(pid: int, field: str = "VmRSS"):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_kb(pid: int):
+    return rss_kb(pid, "VmHWM")
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class AppServer:
+    def __init__(self, name: str, ollama_url: str, extra_env=None):
+        self.name = name
+        self.cwd, self.target, self.workloads = APPS[name]
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ)
+        env.update({
+            "OLLAMA_HOST": ollama_url,
+            "OLLAMA_HOSTS": "",
+            "OLLAMA_WARM_MODELS": "",
+            "TUTOR_CACHE_DB": "",
+            "TUTOR_PDF_CACHE_DB": "",
+            "TUTOR_JOB_DB": "",
+            # Measure queueing, not load shedding: every request is admitted
+            "TUTOR_MAX_QUEUE": "0",
+        })
+        env.update(extra_env or {})
+        self._env = env
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.target, "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.cwd,
+            env=self._env,
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    async def wait_ready(self, client, timeout=60.0, interval=0.2):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with code {self.process.returncode}")
+            try:
+                if (await client.get(f"{self.url}/openapi.json")).status_code == 200:
+                    return
+            except Exception:
+                pass
+            await asyncio.sleep(interval)
+        raise RuntimeError(f"{self.name} did not start within {timeout}s")
+
+
+# One request of a workload; `n` makes every request distinct so caches are not measured
+async def send(client, app: AppServer, workload: str, n: int, args, pdf_dir: str):
+    pdf = make_sample_pdf(args.pdf_pages) + f"\n% request {n}\n".encode("ascii")
+    if app.name == "backend":
+        body = {"grade_level": "8th grade", "input_type": workload, "topic": f"photosynthesis {n}"}
+        if workload == "pdf":
+            path = os.path.join(pdf_dir, f"{n}.pdf")
+            with open(path, "wb") as out:
+                out.write(pdf)
+            body["pdf_path"] = path
+        response = await client.post(f"{app.url}/api/tutor", json=body)
+        response.raise_for_status()
+        if "error" in response.json():
+            raise RuntimeError(response.json()["error"])
+        return
+
+    if workload == "batch":
+        items = [{"grade_level": "8th grade", "input_type": "topic", "topic": f"cells {n}-{i}"} for i in range(args.batch_size)]
+        response = await client.post(f"{app.url}/tutor/batch", json={"items": items, "bypass_cache": True})
+        response.raise_for_status()
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        failed = [line for line in lines if "error" in line]
+        if failed or len(lines) != args.batch_size:
+            raise RuntimeError(f"batch returned {len(lines)} lines, {len(failed)} errors")
+        return
+
+    data = {"grade_level": "8th grade", "input_type": workload, "topic": f"photosynthesis {n}", "bypass_cache": "true"}
+    files = {"pdf_file": ("sample.pdf", pdf, "application/pdf")} if workload == "pdf" else None
+    response = await client.post(f"{app.url}/tutor", data=data, files=files)
+    response.raise_for_status()
+
+
+# One unmeasured request of each workload, so the first measured level does not pay for the
+# app's deferred imports, its first connection to Ollama or its first PDF parse
+async def warm_up(client, app: AppServer, workloads, args, pdf_dir: str):
+    for workload in workloads:
+        if workload in app.workloads:
+            await send(client, app, workload, -1, args, pdf_dir)
+
+
+# `first` numbers the level's requests after those of earlier levels, so a level never
+# resends a document an earlier one already parsed and indexed
+async def run_level(client, app: AppServer, workload: str, concurrency: int, args, pdf_dir: str, first: int = 0) -> dict:
+    counter = iter(range(first, first + args.requests))
+    latencies = []
+    errors = []
+
+    async def worker():
+        for n in counter:
+            started = time.perf_counter()
+            try:
+                await send(client, app, workload, n, args, pdf_dir)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    row = {
+        "app": app.name,
+        "workload": workload,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 3),
+        "p50_ms": None,
+        "p95_ms": None,
+        "p99_ms": None,
+        "peak_rss_kb": peak_rss_kb(app.process.pid),
+    }
+    if latencies:
+        for name, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            row[name] = round(percentile(latencies, fraction) * 1000, 1)
+    if errors:
+        row["first_error"] = errors[0]
+    return row
+
+
+def row_key(row) -> tuple:
+    return row["app"], row["workload"], row["concurrency"]
+
+
+def print_row(row, baseline=None):
+    line = (f"{row['app']:<8} {row['workload']:<6} {row['concurrency']:>4} {row['requests']:>5} {row['errors']:>4} "
+            f"{row['throughput']:>8.2f} {row['p50_ms'] or 0:>8.1f} {row['p95_ms'] or 0:>8.1f} {row['p99_ms'] or 0:>8.1f} "
+            f"{(row['peak_rss_kb'] or 0) / 1024:>7.1f}")
+    if baseline and baseline.get("throughput") and baseline.get("p95_ms") and row["p95_ms"]:
+        line += (f"   req/s {row['throughput'] / baseline['throughput'] - 1:+.0%}"
+                 f"  p95 {row['p95_ms'] / baseline['p95_ms'] - 1:+.0%}")
+    print(line)
+
+
+async def main(args):
+    import httpx
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as previous:
+            baseline = {row_key(row): row for row in json.load(previous)["results"]}
+
+    results = []
+    with FakeOllamaServer(token_delay=args.token_delay, num_tokens=args.num_tokens,
+                          prompt_delay=args.prompt_delay, slots=args.slots) as fake, \
+            tempfile.TemporaryDirectory() as pdf_dir:
+        print(f"{'app':<8} {'load':<6} {'conc':>4} {'reqs':>5} {'errs':>4} {'req/s':>8} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+        async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None)) as client:
+            for name in args.apps:
+                with AppServer(name, fake.url) as app:
+                    await app.wait_ready(client)
+                    await warm_up(client, app, args.workloads, args, pdf_dir)
+                    for workload in args.workloads:
+                        if workload not in app.workloads:
+                            continue
+                        for number, level in enumerate(args.levels):
+                            row = await run_level(client, app, workload, level, args, pdf_dir, number * args.requests)
+                            results.append(row)
+                            print_row(row, baseline.get(row_key(row)))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the tutor services with a fake Ollama")
+    parser.add_argument("--apps", nargs="+", choices=sorted(APPS), default=sorted(APPS, reverse=True))
+    parser.add_argument("--workloads", nargs="+", choices=("topic", "pdf", "batch"), default=["topic", "pdf", "batch"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=32, help="requests per app, workload and level")
+    parser.add_argument("--batch-size", type=int, default=4, help="items per /tutor/batch request")
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds per generated token")
+    parser.add_argument("--prompt-delay", type=float, default=0.0, help="seconds of simulated prompt evaluation")
+    parser.add_argument("--num-tokens", type=int, default=32)
+    parser.add_argument("--slots", type=int, default=0, help="generations the fake server runs at once (0 = unlimited)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,210 @@
+# storage/app/python/concurrency.py
+
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import requests_aborted, stage
+
+# Maximum number of generations sent to Ollama at once; extra requests wait in line
+MAX_IN_FLIGHT = int(os.getenv("TUTOR_MAX_IN_FLIGHT", "4"))
+# Generations allowed to wait for a slot; past that new requests get a 429 (0 = no limit)
+MAX_QUEUE = int(os.getenv("TUTOR_MAX_QUEUE", str(MAX_IN_FLIGHT * 4)))
+# Time limit (seconds) for requests that do not send their own X-Request-Timeout (empty = none)
+REQUEST_TIMEOUT = float(os.getenv("TUTOR_REQUEST_TIMEOUT")) if os.getenv("TUTOR_REQUEST_TIMEOUT") else None
+# Worker threads available for blocking PDF parsing
+PDF_WORKERS = int(os.getenv("TUTOR_PDF_WORKERS", "2"))
+
+pdf_executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf-worker")
+
+
+# Caps concurrent generations and queues the rest; each generation runs inside slot().
+# Requests also take an admission ticket (admit() / leave()) for their whole lifetime, so
+# those still reading their upload or parsing a PDF count against the queue limit too.
+class InFlightLimiter:
+    def __init__(self, limit: int, max_waiting: int = 0):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.average_seconds = None  # moving average of how long a slot is held
+        self._semaphore = asyncio.Semaphore(limit)
+
+    # Work the service has taken on: admitted requests, or queued and running generations
+    # if there are more of those (a batch runs several per request)
+    @property
+    def load(self) -> int:
+        return max(self.admitted, self.in_flight + self.waiting)
+
+    # True when the queue is at its limit and new work should be turned away
+    @property
+    def full(self) -> bool:
+        return self.max_waiting > 0 and self.load >= self.limit + self.max_waiting
+
+    # Take an admission ticket unless the queue is full; the caller must leave() once done
+    def admit(self) -> bool:
+        if self.full:
+            return False
+        self.admitted += 1
+        return True
+
+    def leave(self):
+        self.admitted -= 1
+
+    # Seconds until a slot is likely free for a request arriving now, for Retry-After
+    def retry_after(self) -> int:
+        rounds = max(0, self.load - self.limit) // self.limit + 1
+        return max(1, math.ceil(rounds * (self.average_seconds or 1.0)))
+
+    # One generation's hold on a slot: `async with limiter.slot():`
+    def slot(self):
+        return _Slot(self)
+
+    # Wait for a free slot; returns the time it was taken
+    async def _acquire(self) -> float:
+        self.waiting += 1
+        try:
+            with stage("queue_wait"):
+                await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return time.monotonic()
+
+    # Give a slot back; only slots held to the end of a generation update the average
+    def _release(self, started: float, completed: bool):
+        if completed:
+            held = time.monotonic() - started
+            self.average_seconds = held if self.average_seconds is None else 0.8 * self.average_seconds + 0.2 * held
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+# The start time is kept on the entry rather than keyed by task: a stream can take its slot
+# in Starlette's body task and be closed, leaving the slot, from the request's own task
+class _Slot:
+    def __init__(self, limiter: InFlightLimiter):
+        self.limiter = limiter
+        self.started = None
+
+    async def __aenter__(self):
+        self.started = await self.limiter._acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter._release(self.started, exc_type is None)
+
+
+generation_limiter = InFlightLimiter(MAX_IN_FLIGHT, MAX_QUEUE)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+# Async context manager that cancels the work inside it when the client goes away or the
+# deadline (a time.monotonic() value) passes, raising ClientDisconnected / DeadlineExceeded
+# instead. Cancelling closes the connection to Ollama, which stops the generation there, and
+# frees the request's place in the generation queue. `wait_disconnected()` returns once the
+# client has disconnected.
+class RequestGuard:
+    def __init__(self, wait_disconnected, deadline=None):
+        self.wait_disconnected = wait_disconnected
+        self.deadline = deadline
+        self.reason = None
+        self._task = None
+        self._watcher = None
+
+    async def __aenter__(self):
+        self._task = asyncio.current_task()
+        self._watcher = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._watcher.cancel()
+        if self.reason is None or exc_type is not asyncio.CancelledError:
+            return False
+        if self._task.uncancel() > 0:
+            return False  # cancelled from outside as well
+        requests_aborted.inc(1, self.reason)
+        if self.reason == "deadline":
+            raise DeadlineExceeded("Deadline exceeded before the response was ready") from exc
+        raise ClientDisconnected("Client disconnected") from exc
+
+    async def _watch(self):
+        timeout = None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(self.wait_disconnected(), timeout)
+            self.reason = "disconnect"
+        except TimeoutError:
+            self.reason = "deadline"
+        self._task.cancel()
+
+
+_END = object()
+
+
+# Iterate an async iterator (e.g. a model stream) from a task of its own. When the consumer
+# stops early or is cancelled, that task gets a plain asyncio cancellation, so the stream's
+# cleanup - closing the HTTP response to Ollama - can run. In the consumer itself it could
+# not: Starlette tears requests down with an anyio cancel scope, which cancels every later await.
+async def iterate_detached(iterable):
+    queue = asyncio.Queue(maxsize=16)
+
+    async def pump():
+        try:
+            async for item in iterable:
+                await queue.put((item, None))
+            await queue.put((_END, None))
+        except Exception as e:
+            await queue.put((_END, e))
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        task.cancel()
+
+
+# Run `run(item)` for every (key, item) pair, at most `concurrency` at once, and yield
+# (key, result, error) as each finishes; error is the exception's message, or None. Whatever
+# is still running when the consumer stops early is cancelled.
+async def run_as_completed(items, run, concurrency: int):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(item):
+        async with semaphore:
+            return await run(item)
+
+    tasks = {asyncio.ensure_future(one(item)): key for key, item in items}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    yield tasks[task], None, str(error) or type(error).__name__
+                else:
+                    yield tasks[task], task.result(), None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# Run a blocking PDF call on the bounded worker pool instead of the event loop
+async def run_in_pdf_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pdf_executor, func, *args)
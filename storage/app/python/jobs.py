@@ -0,0 +1,179 @@
+# storage/app/python/jobs.py
+
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Background workers, how long finished results are kept (seconds), and an optional
+# SQLite file that lets queued jobs survive a restart
+JOB_WORKERS = int(os.getenv("TUTOR_JOB_WORKERS", "2"))
+JOB_RESULT_TTL = float(os.getenv("TUTOR_JOB_RESULT_TTL", "3600"))
+JOB_DB = os.getenv("TUTOR_JOB_DB", "")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    def __init__(self, job_id, payload, priority=0, status=QUEUED, result=None, error=None, created=None, finished=None):
+        self.id = job_id
+        self.payload = payload
+        self.priority = priority
+        self.status = status
+        self.result = result
+        self.error = error
+        self.created = created or time.time()
+        self.finished = finished
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created": self.created,
+            "finished": self.finished,
+            "error": self.error,
+        }
+
+
+# In-process job queue: higher priority first, FIFO within a priority.
+# `handler` is an async callable that turns a job payload into its result string.
+class JobQueue:
+    def __init__(self, handler, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL, db_path=JOB_DB):
+        self.handler = handler
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._running = {}
+        self._queue = None
+        self._tasks = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, payload TEXT NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, created REAL NOT NULL, finished REAL)"
+            )
+            self._db.commit()
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        if self._db is not None:
+            self._restore()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payload, priority=0) -> Job:
+        job = Job(uuid.uuid4().hex, payload, priority)
+        self._jobs[job.id] = job
+        self._save(job)
+        self._queue.put_nowait((-priority, next(self._order), job.id))
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        self._finish(job, CANCELLED)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    def stats(self) -> dict:
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                continue  # cancelled or expired while waiting
+
+            job.status = RUNNING
+            self._save(job)
+            task = asyncio.ensure_future(self.handler(job.payload))
+            self._running[job.id] = task
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if job.status != CANCELLED:
+                    raise  # the service is shutting down; the job is picked up again on restart
+                continue
+            except Exception as e:
+                self._finish(job, FAILED, error=str(e) or type(e).__name__)
+            else:
+                self._finish(job, DONE, result=result)
+            finally:
+                self._running.pop(job.id, None)
+
+    # Drop finished jobs once their results have expired
+    async def _janitor(self):
+        while True:
+            await asyncio.sleep(min(self.result_ttl, 60))
+            cutoff = time.time() - self.result_ttl
+            expired = [job.id for job in self._jobs.values() if job.status in FINISHED and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            if self._db is not None:
+                with self._lock:
+                    self._db.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (cutoff,))
+                    self._db.commit()
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        self._save(job)
+
+    def _save(self, job):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, payload, priority, status, result, error, created, finished) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, json.dumps(job.payload), job.priority, job.status, job.result, job.error, job.created, job.finished),
+            )
+            self._db.commit()
+
+    # Reload persisted jobs; anything that was queued or running when the service stopped is queued again
+    def _restore(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, payload, priority, status, result, error, created, finished FROM jobs ORDER BY created"
+            ).fetchall()
+        for job_id, payload, priority, status, result, error, created, finished in rows:
+            if status in FINISHED and finished < cutoff:
+                continue
+            job = Job(job_id, json.loads(payload), priority, status, result, error, created, finished)
+            if status not in FINISHED:
+                job.status = QUEUED
+                self._queue.put_nowait((-priority, next(self._order), job.id))
+            self._jobs[job.id] = job
@@ -0,0 +1,150 @@
+# storage/app/python/llm_registry.py
+
+import asyncio
+import os
+import threading
+
+# httpx, langchain_ollama and ollama are imported on first use: together they are most of
+# the service's import time, and a worker should be able to answer before it needs them
+
+# Comma-separated Ollama nodes to spread generations over; with one (or none) every
+# request goes to that host (None lets the client fall back to OLLAMA_HOST / localhost)
+HOSTS = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host.strip()]
+DEFAULT_HOST = HOSTS[0] if HOSTS else (os.getenv("OLLAMA_HOST") or None)
+# How long Ollama keeps a model loaded after its last request
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Idle keep-alive HTTP connections kept per client, and how long they stay open (seconds)
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "300"))
+# Seconds to wait for a connection, and between two reads of a response (empty = no limit)
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT")) if os.getenv("OLLAMA_READ_TIMEOUT") else None
+# Multi-node settings: extra nodes tried after a connection failure or timeout, how long a
+# failed node is skipped, and how often nodes are health-checked (seconds)
+RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+FAILURE_COOLDOWN = float(os.getenv("OLLAMA_FAILURE_COOLDOWN", "10"))
+HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+# Comma-separated models loaded by warm_up() at service startup
+WARM_MODELS = [name.strip() for name in os.getenv("OLLAMA_WARM_MODELS", "gemma3").split(",") if name.strip()]
+# num_ctx every model is warmed with and every request to it uses, with per-model sizes in
+# OLLAMA_MODEL_CTX (e.g. "llama3=8192,gemma3:4b=2048"). Ollama reloads a model when a request
+# asks for another num_ctx, so a model's size never changes between requests.
+WARM_CTX = int(os.getenv("OLLAMA_WARM_CTX", "4096"))
+MODEL_CTX = {
+    name.strip(): int(size)
+    for name, _, size in (item.partition("=") for item in os.getenv("OLLAMA_MODEL_CTX", "").split(","))
+    if name.strip() and size.strip()
+}
+
+backend_pool = None
+if len(HOSTS) > 1:
+    from balancer import BackendPool
+    backend_pool = BackendPool(HOSTS, FAILURE_COOLDOWN, HEALTH_INTERVAL)
+
+_clients = {}
+_balanced = {}
+_lock = threading.Lock()
+
+
+# One shared client per (host, model, settings); every agent asking for the same model reuses
+# the same HTTP connection pool instead of building its own at import time.
+# chat=True gives a ChatOllama (chat API, messages in, AIMessage out) instead of an OllamaLLM.
+# Without an explicit host and with several OLLAMA_HOSTS, the client is load balanced.
+def get_llm(model: str, host: str = None, chat: bool = False, **params):
+    settings = tuple(sorted(params.items()))
+    if host is None and backend_pool is not None:
+        with _lock:
+            llm = _balanced.get((model, chat, settings))
+            if llm is None:
+                from balancer import BalancedLLM
+                llm = BalancedLLM(model, backend_pool, lambda url: get_llm(model, url, chat, **params), RETRIES)
+                _balanced[(model, chat, settings)] = llm
+            return llm
+
+    host = host or DEFAULT_HOST
+    key = (host, model, chat, settings)
+    with _lock:
+        llm = _clients.get(key)
+        if llm is None:
+            import httpx
+            from langchain_ollama import ChatOllama, OllamaLLM
+            limits = httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY)
+            timeout = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+            client_class = ChatOllama if chat else OllamaLLM
+            llm = client_class(
+                model=model,
+                base_url=host,
+                keep_alive=KEEP_ALIVE,
+                client_kwargs={"limits": limits, "timeout": timeout},
+                **params,
+            )
+            _clients[key] = llm
+        return llm
+
+
+# Shared embedding client per (host, model); embeddings are cheap, so they are not load balanced
+def get_embeddings(model: str, host: str = None):
+    host = host or DEFAULT_HOST
+    key = (host, model, "embeddings", ())
+    with _lock:
+        embeddings = _clients.get(key)
+        if embeddings is None:
+            import httpx
+            from langchain_ollama import OllamaEmbeddings
+            limits = httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=KEEPALIVE_EXPIRY)
+            timeout = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+            embeddings = OllamaEmbeddings(model=model, base_url=host, client_kwargs={"limits": limits, "timeout": timeout})
+            _clients[key] = embeddings
+        return embeddings
+
+
+# Ollama options a client sends with every call (the same list langchain_ollama builds)
+OPTION_NAMES = (
+    "mirostat", "mirostat_eta", "mirostat_tau", "num_ctx", "num_gpu", "num_thread", "num_predict",
+    "repeat_last_n", "repeat_penalty", "temperature", "seed", "stop", "tfs_z", "top_k", "top_p",
+)
+
+
+# The same shared client with per-call options (e.g. a token budget's num_ctx / num_predict)
+# on top of its own settings. Passing them per call, instead of asking get_llm for a client
+# per value, keeps one connection pool per model.
+def with_options(llm, **options):
+    merged = {name: getattr(llm, name, None) for name in OPTION_NAMES}
+    merged = {name: value for name, value in merged.items() if value is not None}
+    merged.update(options)
+    return llm.bind(options=merged)
+
+
+# The num_ctx a model is loaded and called with
+def context_window(model: str) -> int:
+    return MODEL_CTX.get(model, WARM_CTX)
+
+
+def registered_models() -> list:
+    with _lock:
+        return sorted({(host or "default", model) for host, model, _, _ in _clients})
+
+
+# Ask Ollama to load each model now (an empty prompt loads it without generating),
+# so the first real request does not pay for the cold load. Every node is warmed.
+async def warm_up(models=None):
+    from ollama import AsyncClient
+
+    hosts = HOSTS or [DEFAULT_HOST]
+    clients = {host: AsyncClient(host=host) for host in hosts}
+
+    async def load(host, model):
+        try:
+            options = {"num_ctx": context_window(model)}
+            await clients[host].generate(model=model, prompt="", keep_alive=KEEP_ALIVE, options=options)
+            return host, model, None
+        except Exception as e:
+            return host, model, str(e) or type(e).__name__
+
+    results = await asyncio.gather(*(load(host, model) for host in hosts for model in (models or WARM_MODELS)))
+    for host, model, error in results:
+        if error:
+            print(f"Warm-up of {model} on {host or 'default host'} failed: {error}")
+    if len(hosts) == 1:
+        return {model: error is None for _, model, error in results}
+    return {f"{host}/{model}": error is None for host, model, error in results}
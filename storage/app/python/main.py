@@ -1,33 +1,649 @@
-from fastapi import FastAPI, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from contextlib import aclosing, asynccontextmanager
+import asyncio
+from fastapi import FastAPI, Request, UploadFile, Form, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import Headers
+import json
+import time
 import traceback
-from tutor_agent import generate_output_with_file
+from pdf_extract import MAX_PDF_BYTES, PDFTooLarge
+from tutor_agent import MAX_BATCH_ITEMS, BatchInput, generate_batch, generate_output_with_file, load, prepare_request, run_job, stream_output
+from text_agents import (
+    BOOK_MAX_PDF_BYTES, LEARNING_SPEEDS, MAX_VARIANTS, SECTION_LOOKAHEAD, VARIANT_CONCURRENCY, generate_variants,
+    level_sections, level_text, load as load_agents, open_sections, proofread_text, read_upload, rewrite_text,
+    summarize_pages,
+)
+from response_cache import response_cache
+from sessions import ask, load as load_sessions, session_store, start_session
+from jobs import CANCELLED, DONE, FAILED, JobQueue
+from llm_registry import WARM_MODELS, backend_pool, registered_models, warm_up
+from concurrency import REQUEST_TIMEOUT, ClientDisconnected, DeadlineExceeded, RequestGuard, generation_limiter
+from metrics import SERVER_TIMING, Gauge, render_metrics, request_seconds, requests_aborted, server_timing, start_trace
 
-app = FastAPI()
+job_queue = JobQueue(run_job)
+
+Gauge("tutor_generations_in_flight", "Generations currently running on Ollama", lambda: generation_limiter.in_flight)
+Gauge("tutor_generations_waiting", "Generations queued for a free slot", lambda: generation_limiter.waiting)
+Gauge("tutor_requests_admitted", "Generation requests holding an admission ticket", lambda: generation_limiter.admitted)
+Gauge("tutor_generation_slots", "Maximum generations run at once", lambda: generation_limiter.limit)
+Gauge("tutor_jobs", "Background jobs by status", job_queue.stats, label="status")
+Gauge("tutor_sessions", "Tutor sessions held in memory", lambda: len(session_store))
+Gauge("tutor_sessions_evicted_total", "Sessions dropped to make room for new ones",
+      lambda: session_store.evicted, kind="counter")
+Gauge("tutor_cache_lookups_total", "Response cache lookups by result",
+      lambda: {"hit": response_cache.hits, "miss": response_cache.misses}, label="result", kind="counter")
+
+# Deferred imports and clients first (in a thread, so requests are served meanwhile), then the models
+async def warm_all():
+    await asyncio.to_thread(load)
+    await asyncio.to_thread(load_agents)
+    await asyncio.to_thread(load_sessions)
+    return await warm_up()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the models in the background so startup is not blocked on Ollama
+    warm_task = asyncio.create_task(warm_all()) if WARM_MODELS else None
+    await job_queue.start()
+    if backend_pool is not None:
+        backend_pool.start_health_checks()
+    yield
+    if backend_pool is not None:
+        await backend_pool.stop_health_checks()
+    if warm_task is not None:
+        warm_task.cancel()
+    await job_queue.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Refuse oversized uploads from their Content-Length, before the body is read at all, and
+# count the bytes of every multipart body as it arrives: one sent without a length (chunked)
+# is cut off with a 413 once it passes the limit, instead of being spooled to disk in full.
+FORM_OVERHEAD = 64 * 1024  # room for the other form fields
+# Routes that read their PDF page by page accept larger files
+UPLOAD_LIMITS = {"/level/sections": BOOK_MAX_PDF_BYTES}
+
+# Plain ASGI middleware: an @app.middleware("http") function cannot wrap `receive`
+class UploadLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        headers = Headers(scope=scope) if scope["type"] == "http" else None
+        if headers is None or not headers.get("content-type", "").startswith("multipart/form-data"):
+            return await self.app(scope, receive, send)
+        limit = UPLOAD_LIMITS.get(scope["path"], MAX_PDF_BYTES)
+        length = headers.get("content-length")
+        if length and length.isdigit() and int(length) > limit + FORM_OVERHEAD:
+            response = JSONResponse(status_code=413, content={"detail": str(PDFTooLarge(limit))})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        # Raised while FastAPI parses the form, which passes HTTPExceptions through as they are
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + FORM_OVERHEAD:
+                    raise HTTPException(status_code=413, detail=str(PDFTooLarge(limit)))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadLimitMiddleware)
+
+# Requests that start generations. New ones are turned away with 429 and a Retry-After
+# estimate while TUTOR_MAX_QUEUE generations are already waiting for a slot, so an
+# overloaded service fails fast instead of queueing work its clients give up on.
+GENERATION_ROUTES = {
+    "/tutor", "/tutor/stream", "/tutor/batch",
+    "/level", "/level/variants", "/level/sections", "/rewrite", "/rewrite/variants", "/summarize", "/proofread",
+    "/tutor/sessions",
+}
+
+def is_generation_route(path: str) -> bool:
+    return path in GENERATION_ROUTES or (path.startswith("/tutor/sessions/") and path.endswith("/ask"))
+
+# Wraps a response so the request's admission ticket is given back once the response has
+# been sent or the client has gone, not when call_next returns: for a streamed response
+# that is as soon as the headers are ready.
+class TicketResponse:
+    def __init__(self, response):
+        self.response = response
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            generation_limiter.leave()
+
+# Each generation request holds an admission ticket from here until its response is done,
+# and is turned away while the tickets in use reach TUTOR_MAX_IN_FLIGHT + TUTOR_MAX_QUEUE.
+# Also reads the optional "X-Request-Timeout: <seconds>" header (default TUTOR_REQUEST_TIMEOUT)
+# into request.state.deadline; request_guard() stops the work once it passes.
+@app.middleware("http")
+async def admission_middleware(request: Request, call_next):
+    if request.method != "POST" or not is_generation_route(request.url.path):
+        return await call_next(request)
+    timeout = request.headers.get("x-request-timeout")
+    try:
+        timeout = float(timeout) if timeout else REQUEST_TIMEOUT
+    except ValueError:
+        return JSONResponse(status_code=400, content={"detail": "X-Request-Timeout must be a number of seconds"})
+    if not generation_limiter.admit():
+        requests_aborted.inc(1, "overload")
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests are waiting for a generation slot"},
+            headers={"Retry-After": str(generation_limiter.retry_after())},
+        )
+    request.state.deadline = time.monotonic() + timeout if timeout is not None else None
+    try:
+        response = await call_next(request)
+    except BaseException:
+        generation_limiter.leave()
+        raise
+    return TicketResponse(response)
+
+# Cancels the work inside it when the client disconnects or the request's deadline passes.
+# The body has been read by then, so the next message from the server is the disconnect.
+def request_guard(request: Request) -> RequestGuard:
+    async def wait_disconnected():
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    return RequestGuard(wait_disconnected, getattr(request.state, "deadline", None))
+
+# 499 (nginx's "client closed request") is only seen in logs and metrics; the client is gone
+def aborted_response(e: Exception):
+    if isinstance(e, DeadlineExceeded):
+        return JSONResponse(status_code=504, content={"detail": str(e)})
+    return JSONResponse(status_code=499, content={"detail": str(e)})
+
+# StreamingResponse that closes its body generator however the stream ends. Starlette
+# stops iterating when the client disconnects but leaves the generator suspended until
+# garbage collection, and with it the model stream and the connection to Ollama.
+class ClosingStreamingResponse(StreamingResponse):
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+# Time every request per route, collect its stages, and add a Server-Timing header when
+# TUTOR_SERVER_TIMING=1 or the client sends "X-Server-Timing: 1". Streamed responses only
+# include the stages that finished before the first byte was sent.
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    trace = start_trace()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    request_seconds.observe(elapsed, request.method, route.path if route else "unmatched", response.status_code)
+    if SERVER_TIMING or request.headers.get("x-server-timing") == "1":
+        response.headers["Server-Timing"] = server_timing(trace, elapsed)
+    return response
 
 @app.post("/tutor")
 async def tutor_endpoint(
+    request: Request,
     grade_level: str = Form(...),
     input_type: str = Form(...),
     topic: str = Form(""),
     add_cont: str = Form(""),
-    pdf_file: UploadFile = None
+    pdf_file: UploadFile = None,
+    bypass_cache: bool = Form(False)
 ):
     try:
         if input_type == "pdf" and not pdf_file:
             raise HTTPException(status_code=400, detail="PDF file required for PDF input_type")
 
-        output = await generate_output_with_file(
-            grade_level=grade_level,
-            input_type=input_type,
-            topic=topic,
-            add_cont=add_cont,
-            pdf_file=pdf_file
-        )
+        timings = {}
+        async with request_guard(request):
+            output = await generate_output_with_file(
+                grade_level=grade_level,
+                input_type=input_type,
+                topic=topic,
+                add_cont=add_cont,
+                pdf_file=pdf_file,
+                use_cache=not bypass_cache,
+                timings=timings
+            )
+
+        return {"output": output, "timings": timings}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return agent_error(e)
+
+# Same inputs as /tutor, but the explanation is sent as Server-Sent Events while it is generated:
+#   data: {"token": "..."}   for every piece of cleaned text
+#   event: done              once generation has finished, with the prompt/generation timings
+#   event: error             with {"detail": "..."} if generation fails midway or the deadline passes
+@app.post("/tutor/stream")
+async def tutor_stream_endpoint(
+    request: Request,
+    grade_level: str = Form(...),
+    input_type: str = Form(...),
+    topic: str = Form(""),
+    add_cont: str = Form(""),
+    pdf_file: UploadFile = None,
+    bypass_cache: bool = Form(False)
+):
+    if input_type == "pdf" and not pdf_file:
+        return JSONResponse(status_code=400, content={"detail": "PDF file required for PDF input_type"})
+
+    # Read the upload before the response starts so PDF errors still get a normal status code
+    try:
+        async with request_guard(request):
+            prompt, user_input = await prepare_request(grade_level, input_type, topic, add_cont, pdf_file)
+    except Exception as e:
+        return agent_error(e)
+
+    async def events():
+        timings = {}
+        try:
+            async with request_guard(request):
+                async with aclosing(stream_output(prompt, user_input, use_cache=not bypass_cache, timings=timings)) as pieces:
+                    async for piece in pieces:
+                        yield f"data: {json.dumps({'token': piece})}\n\n"
+            yield f"event: done\ndata: {json.dumps(timings)}\n\n"
+        except ClientDisconnected:
+            return
+        except DeadlineExceeded as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        except Exception as e:
+            print(traceback.format_exc())
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return ClosingStreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Many explanations in one call. Body: {"items": [TutorInput-shaped objects], "concurrency": n}.
+# Streams one NDJSON line per item as it completes: {"index": i, "output": "..."} or {"index": i, "error": "..."}
+# Items still unfinished when the deadline passes are reported with an error.
+@app.post("/tutor/batch")
+async def tutor_batch_endpoint(request: Request, batch: BatchInput):
+    if not batch.items or len(batch.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_BATCH_ITEMS} items can be sent")
+
+    async def lines():
+        unfinished = set(range(len(batch.items)))
+        try:
+            async with request_guard(request):
+                results = generate_batch(batch.items, batch.concurrency, use_cache=not batch.bypass_cache)
+                async with aclosing(results):
+                    async for indices, output, error in results:
+                        for index in indices:
+                            unfinished.discard(index)
+                            result = {"index": index, "error": error} if error is not None else {"index": index, "output": output}
+                            yield json.dumps(result) + "\n"
+        except ClientDisconnected:
+            return
+        except DeadlineExceeded as e:
+            for index in sorted(unfinished):
+                yield json.dumps({"index": index, "error": str(e)}) + "\n"
+
+    return ClosingStreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Asynchronous variant of /tutor: returns a job id right away (202) and generates in the background.
+# Poll GET /tutor/jobs/{job_id}, fetch GET /tutor/jobs/{job_id}/result, cancel with DELETE.
+@app.post("/tutor/jobs", status_code=202)
+async def submit_tutor_job(
+    grade_level: str = Form(...),
+    input_type: str = Form(...),
+    topic: str = Form(""),
+    add_cont: str = Form(""),
+    pdf_file: UploadFile = None,
+    priority: int = Form(0)
+):
+    if input_type == "pdf" and not pdf_file:
+        return JSONResponse(status_code=400, content={"detail": "PDF file required for PDF input_type"})
+
+    try:
+        # The PDF is read now so the queued job does not depend on the upload
+        _, user_input = await prepare_request(grade_level, input_type, topic, add_cont, pdf_file)
+    except Exception as e:
+        return agent_error(e)
+
+    job = job_queue.submit(user_input, priority)
+    return job.to_dict()
 
-        return {"output": output}
+@app.get("/tutor/jobs/{job_id}")
+async def tutor_job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
 
+@app.get("/tutor/jobs/{job_id}/result")
+async def tutor_job_result(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    if job.status == DONE:
+        return {"output": job.result}
+    if job.status == FAILED:
+        return JSONResponse(status_code=500, content={"detail": job.error})
+    if job.status == CANCELLED:
+        return JSONResponse(status_code=410, content={"detail": "Job was cancelled"})
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+@app.delete("/tutor/jobs/{job_id}")
+async def cancel_tutor_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
+
+# Multi-turn tutoring: POST /tutor/sessions takes the same fields as /tutor and returns
+# {"session_id", "output", "timings"}; follow-up questions go to /tutor/sessions/{id}/ask and
+# are answered from the document and conversation kept on the server (see sessions.py).
+@app.post("/tutor/sessions")
+async def create_tutor_session(
+    request: Request,
+    grade_level: str = Form(...),
+    input_type: str = Form(...),
+    topic: str = Form(""),
+    add_cont: str = Form(""),
+    pdf_file: UploadFile = None,
+    bypass_cache: bool = Form(False)
+):
+    if input_type == "pdf" and not pdf_file:
+        raise HTTPException(status_code=400, detail="PDF file required for PDF input_type")
+    timings = {}
+    try:
+        async with request_guard(request):
+            session, output = await start_session(
+                grade_level, input_type, topic, add_cont, pdf_file, use_cache=not bypass_cache, timings=timings
+            )
+    except Exception as e:
+        return agent_error(e)
+    return {"session_id": session.id, "output": output, "timings": timings}
+
+# {"output", "turn": number of this turn in the session, "timings"}
+@app.post("/tutor/sessions/{session_id}/ask")
+async def ask_tutor_session(request: Request, session_id: str, question: str = Form(...)):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    if not question.strip():
+        raise HTTPException(status_code=400, detail="question is required")
+    timings = {}
+    try:
+        async with request_guard(request):
+            output = await ask(session, question, timings)
+    except Exception as e:
+        return agent_error(e)
+    return {"output": output, "turn": session.count, "timings": timings}
+
+@app.get("/tutor/sessions/{session_id}")
+async def tutor_session_status(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return session.to_dict()
+
+@app.delete("/tutor/sessions/{session_id}")
+async def end_tutor_session(session_id: str):
+    session = session_store.remove(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return session.to_dict()
+
+# Text agents (leveler, rewriter, summarizer, proofreader). Each takes either `text` or a
+# `pdf_file` upload with an optional `pages` range ("3-10", empty for all pages) and returns
+# {"output": "..."} (the proofreader adds its list of changes); they share the tutor's PDF
+# parsing, Ollama clients and generation limit.
+async def agent_pages(text: str, pdf_file: UploadFile, pages: str) -> list:
+    if pdf_file is not None:
+        return await read_upload(pdf_file, pages)
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Either text or a pdf_file is required")
+    return [text]
+
+def agent_error(e: Exception):
+    if isinstance(e, (ClientDisconnected, DeadlineExceeded)):
+        return aborted_response(e)
+    if isinstance(e, PDFTooLarge):
+        return JSONResponse(status_code=413, content={"detail": str(e)})
+    if isinstance(e, ValueError):
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    traceback_str = traceback.format_exc()
+    print(traceback_str)
+    return JSONResponse(status_code=500, content={"detail": str(e), "trace": traceback_str})
+
+# `run(usage)` produces the output; `usage` collects the token budget and counts of its model calls
+async def agent_response(request: Request, run):
+    usage = {}
+    try:
+        async with request_guard(request):
+            result = await run(usage)
+        return result if isinstance(result, dict) else {"output": result, "usage": usage}
+    except HTTPException:
+        raise
+    except Exception as e:
+        return agent_error(e)
+
+# Comma-separated form field -> its distinct values, in order
+def form_list(value: str) -> list:
+    return list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+
+# Several variants of one document: it is read once, then `generate(document, **variant)` runs for
+# every variant concurrently. Returns {"variants": [...]} in request order, or with stream=true
+# one NDJSON line per variant as it finishes: {"index": i, <variant fields>, "output" and "usage", or "error"}
+async def variants_response(request, variants, generate, text, pdf_file, pages, concurrency, stream):
+    if not variants or len(variants) > MAX_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_VARIANTS} variants can be requested")
+    try:
+        async with request_guard(request):
+            document = "\n".join(await agent_pages(text, pdf_file, pages))
+    except HTTPException:
+        raise
+    except Exception as e:
+        return agent_error(e)
+
+    async def run(**variant):
+        usage = {}
+        return await generate(document, usage=usage, **variant), usage
+
+    def result(index, output, error):
+        item = dict(variants[index])
+        if error is not None:
+            item["error"] = error
+        else:
+            item["output"], item["usage"] = output
+        return item
+
+    if stream:
+        async def lines():
+            unfinished = set(range(len(variants)))
+            try:
+                async with request_guard(request):
+                    async with aclosing(generate_variants(variants, run, concurrency)) as results:
+                        async for index, output, error in results:
+                            unfinished.discard(index)
+                            yield json.dumps({"index": index, **result(index, output, error)}) + "\n"
+            except ClientDisconnected:
+                return
+            except DeadlineExceeded as e:
+                for index in sorted(unfinished):
+                    yield json.dumps({"index": index, **result(index, None, str(e))}) + "\n"
+
+        return ClosingStreamingResponse(lines(), media_type="application/x-ndjson")
+
+    collected = [None] * len(variants)
+    try:
+        async with request_guard(request):
+            async for index, output, error in generate_variants(variants, run, concurrency):
+                collected[index] = result(index, output, error)
+    except ClientDisconnected as e:
+        return aborted_response(e)
+    except DeadlineExceeded as e:
+        # Variants that finished in time are still returned
+        collected = [item if item is not None else result(index, None, str(e)) for index, item in enumerate(collected)]
+    return {"variants": collected}
+
+@app.post("/level")
+async def level_endpoint(
+    request: Request,
+    grade_level: str = Form(...),
+    learning_speed: str = Form(...),
+    text: str = Form(""),
+    pdf_file: UploadFile = None,
+    pages: str = Form("")
+):
+    async def run(usage):
+        context = "\n".join(await agent_pages(text, pdf_file, pages))
+        return await level_text(context, grade_level, learning_speed, usage)
+    return await agent_response(request, run)
+
+@app.post("/rewrite")
+async def rewrite_endpoint(
+    request: Request,
+    level: str = Form(...),
+    text: str = Form(""),
+    pdf_file: UploadFile = None,
+    pages: str = Form("")
+):
+    async def run(usage):
+        document = "\n".join(await agent_pages(text, pdf_file, pages))
+        return await rewrite_text(document, level, usage)
+    return await agent_response(request, run)
+
+# Every (grade level, learning speed) combination of comma-separated lists, from one upload
+@app.post("/level/variants")
+async def level_variants_endpoint(
+    request: Request,
+    grade_levels: str = Form(...),
+    learning_speeds: str = Form(",".join(LEARNING_SPEEDS)),
+    text: str = Form(""),
+    pdf_file: UploadFile = None,
+    pages: str = Form(""),
+    concurrency: int = Form(VARIANT_CONCURRENCY),
+    stream: bool = Form(False)
+):
+    variants = [
+        {"grade_level": grade_level, "learning_speed": speed}
+        for grade_level in form_list(grade_levels) for speed in form_list(learning_speeds)
+    ]
+    return await variants_response(request, variants, level_text, text, pdf_file, pages, concurrency, stream)
+
+# A whole document (e.g. a textbook) explained section by section, streamed as NDJSON in
+# document order: {"section", "pages", "output", "usage", "resume"} per section as soon as it is
+# ready, then {"done": true, "sections": n}, or a line with "error" that ends the stream. Send
+# the "resume" cursor of the last section received to continue after it.
+@app.post("/level/sections")
+async def level_sections_endpoint(
+    request: Request,
+    grade_level: str = Form(...),
+    learning_speed: str = Form(...),
+    text: str = Form(""),
+    pdf_file: UploadFile = None,
+    pages: str = Form(""),
+    resume: str = Form(""),
+    lookahead: int = Form(SECTION_LOOKAHEAD)
+):
+    if pdf_file is None and not text.strip():
+        raise HTTPException(status_code=400, detail="Either text or a pdf_file is required")
+    try:
+        if pdf_file is not None and pdf_file.size is not None and pdf_file.size > BOOK_MAX_PDF_BYTES:
+            raise PDFTooLarge(BOOK_MAX_PDF_BYTES)
+        sections = open_sections(pdf_file.file if pdf_file is not None else text, pages, resume)
     except Exception as e:
-        traceback_str = traceback.format_exc()
-        print(traceback_str)
-        return JSONResponse(status_code=500, content={"detail": str(e), "trace": traceback_str})
+        if pdf_file is not None:
+            await pdf_file.close()
+        return agent_error(e)
+
+    async def lines():
+        count = 0
+        try:
+            async with request_guard(request):
+                async with aclosing(level_sections(sections, grade_level, learning_speed, lookahead)) as results:
+                    async for item in results:
+                        if "error" in item:
+                            yield json.dumps(item) + "\n"
+                            return
+                        count += 1
+                        yield json.dumps(item) + "\n"
+            yield json.dumps({"done": True, "sections": count}) + "\n"
+        except ClientDisconnected:
+            return
+        except Exception as e:
+            # Deadline, or a PDF that could not be read
+            yield json.dumps({"error": str(e) or type(e).__name__}) + "\n"
+        finally:
+            if pdf_file is not None:
+                await pdf_file.close()
+
+    return ClosingStreamingResponse(lines(), media_type="application/x-ndjson")
+
+# One rewrite per learning speed (all three by default), from one upload
+@app.post("/rewrite/variants")
+async def rewrite_variants_endpoint(
+    request: Request,
+    levels: str = Form(",".join(LEARNING_SPEEDS)),
+    text: str = Form(""),
+    pdf_file: UploadFile = None,
+    pages: str = Form(""),
+    concurrency: int = Form(VARIANT_CONCURRENCY),
+    stream: bool = Form(False)
+):
+    variants = [{"level": level} for level in form_list(levels)]
+    unknown = [variant["level"] for variant in variants if variant["level"] not in LEARNING_SPEEDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown levels: {', '.join(unknown)}")
+    return await variants_response(request, variants, rewrite_text, text, pdf_file, pages, concurrency, stream)
+
+@app.post("/summarize")
+async def summarize_endpoint(
+    request: Request,
+    conditions: str = Form(...),
+    text: str = Form(""),
+    pdf_file: UploadFile = None,
+    pages: str = Form("")
+):
+    async def run(usage):
+        return await summarize_pages(await agent_pages(text, pdf_file, pages), conditions, usage=usage)
+    return await agent_response(request, run)
+
+# {"output": corrected text, "changes": [{"paragraph", "type", "original", "corrected"}],
+#  "paragraphs": n, "reused": paragraphs answered from the cache, "usage": token totals}
+@app.post("/proofread")
+async def proofread_endpoint(request: Request, text: str = Form(...)):
+    async def run(usage):
+        if not text.strip():
+            raise HTTPException(status_code=400, detail="text is required")
+        return await proofread_text(text)
+    return await agent_response(request, run)
+
+# Hit/miss counters of the tutor response cache
+@app.get("/tutor/cache")
+async def tutor_cache_stats():
+    return response_cache.stats()
+
+# Models with a shared client in this process, and an explicit warm-up hook
+@app.get("/models")
+async def list_models():
+    return {"models": [{"host": host, "model": model} for host, model in registered_models()]}
+
+@app.post("/models/warm")
+async def warm_models():
+    return await warm_all()
+
+# Ollama nodes behind the load balancer (empty when a single host is used)
+@app.get("/backends")
+async def list_backends():
+    return {"backends": backend_pool.status() if backend_pool is not None else []}
+
+# Prometheus scrape endpoint: stage latencies, token rates, queue depth and in-flight generations
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
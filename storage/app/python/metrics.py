@@ -0,0 +1,177 @@
+# storage/app/python/metrics.py
+#
+# Per-stage latency and throughput metrics in the Prometheus text format, without an
+# extra dependency. Code wraps each stage of a request in `with stage("name"):`; the
+# duration goes into a histogram and, while a request trace is active, into that
+# request's Server-Timing header.
+
+import bisect
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+# Send a Server-Timing header on every response instead of only when the client asks
+# for it with "X-Server-Timing: 1"
+SERVER_TIMING = os.getenv("TUTOR_SERVER_TIMING", "0") == "1"
+
+# Histogram buckets: seconds for latencies, tokens per second for generation speed
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+
+_metrics = []
+_trace = contextvars.ContextVar("tutor_trace", default=None)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1.0, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + ('+Inf',))} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+# Value read at scrape time, e.g. the current queue depth.
+# `read` returns a number, or a {label value: number} dict when `label` is given.
+class Gauge:
+    def __init__(self, name: str, help: str, read, label: str = None, kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label = label
+        self.kind = kind
+        _metrics.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.read()
+        if self.label is None:
+            lines.append(f"{self.name} {value}")
+        else:
+            for key, item in sorted(value.items()):
+                lines.append(f"{self.name}{_labels((self.label,), (key,))} {item}")
+        return lines
+
+
+stage_seconds = Histogram("tutor_stage_seconds", "Time spent in each stage of a tutor request", ("stage",))
+request_seconds = Histogram("tutor_request_seconds", "HTTP request latency", ("method", "route", "status"))
+requests_aborted = Counter(
+    "tutor_requests_aborted_total", "Requests stopped early: client disconnect, deadline or overload", ("reason",)
+)
+prompt_tokens = Counter("tutor_prompt_tokens_total", "Prompt tokens evaluated by Ollama")
+generated_tokens = Counter("tutor_generated_tokens_total", "Tokens generated by Ollama")
+tokens_per_second = Histogram(
+    "tutor_generation_tokens_per_second", "Generation speed reported by Ollama", buckets=TOKEN_RATE_BUCKETS
+)
+prompt_tokens_per_second = Histogram(
+    "tutor_prompt_tokens_per_second", "Prompt evaluation speed reported by Ollama", buckets=TOKEN_RATE_BUCKETS + (500, 1000, 5000)
+)
+
+
+# Start collecting the stages of the current request; returns the list they are appended to
+def start_trace() -> list:
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+def record(name: str, seconds: float):
+    stage_seconds.observe(seconds, name)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+# Token counters and Ollama's own prompt-eval / generation durations (seconds)
+def observe_generation(prompt_count, prompt_seconds, eval_count, eval_seconds):
+    if prompt_count:
+        prompt_tokens.inc(prompt_count)
+        if prompt_seconds:
+            prompt_tokens_per_second.observe(prompt_count / prompt_seconds)
+    if eval_count:
+        generated_tokens.inc(eval_count)
+        if eval_seconds:
+            tokens_per_second.observe(eval_count / eval_seconds)
+    if prompt_seconds is not None:
+        record("ollama_prompt_eval", prompt_seconds)
+    if eval_seconds is not None:
+        record("ollama_eval", eval_seconds)
+
+
+# Server-Timing header value for a finished trace, durations in milliseconds
+def server_timing(trace: list, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
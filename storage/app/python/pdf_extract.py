@@ -0,0 +1,110 @@
+# storage/app/python/pdf_extract.py
+
+import hashlib
+import io
+import json
+import os
+from response_cache import ResponseCache
+
+# Extracted documents kept in memory, their lifetime, and an optional SQLite file for a persistent tier
+PDF_CACHE_SIZE = int(os.getenv("TUTOR_PDF_CACHE_SIZE", "128"))
+PDF_CACHE_TTL = float(os.getenv("TUTOR_PDF_CACHE_TTL", "604800"))
+PDF_CACHE_DB = os.getenv("TUTOR_PDF_CACHE_DB", "")
+# Largest PDF accepted, in bytes (the Laravel form allows 5 MB)
+MAX_PDF_BYTES = int(os.getenv("TUTOR_MAX_PDF_BYTES", str(5 * 1024 * 1024)))
+
+# Page texts keyed by the SHA-256 of the uploaded bytes and the requested page range
+page_cache = ResponseCache(max_entries=PDF_CACHE_SIZE, ttl=PDF_CACHE_TTL, db_path=PDF_CACHE_DB)
+
+
+class PDFTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"PDF is larger than the {max_bytes // 1024} KB limit.")
+
+
+def pdf_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# Hash an open binary file in 1 MB blocks and rewind it; stops as soon as it grows past max_bytes
+def stream_digest(f, max_bytes=None) -> str:
+    digest = hashlib.sha256()
+    size = 0
+    f.seek(0)
+    for block in iter(lambda: f.read(1 << 20), b""):
+        size += len(block)
+        if max_bytes is not None and size > max_bytes:
+            raise PDFTooLarge(max_bytes)
+        digest.update(block)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return stream_digest(f)
+
+
+# Digest of a path, PDF bytes or open binary file, as used for the cache keys
+def source_digest(source, max_bytes=None) -> str:
+    if isinstance(source, (bytes, bytearray)):
+        if max_bytes is not None and len(source) > max_bytes:
+            raise PDFTooLarge(max_bytes)
+        return pdf_digest(source)
+    if isinstance(source, str):
+        if not os.path.exists(source):
+            raise FileNotFoundError("PDF file not found.")
+        return file_digest(source)
+    return stream_digest(source, max_bytes)
+
+
+# "3-10" -> (2, 8), "5" -> (4, 1), "" -> (0, None); pages are 1-based for users
+def parse_page_range(text: str):
+    text = text.strip()
+    if not text:
+        return 0, None
+    first, dash, last = text.partition("-")
+    start = max(int(first) - 1, 0)
+    if not dash:
+        return start, 1
+    if not last.strip():
+        return start, None
+    return start, max(int(last) - start, 0)
+
+
+# Lazily yield the text of pages [start, start + limit) in the same form PyPDFLoader
+# produces; pages outside the range are never parsed. `source` is a path, PDF bytes or
+# an open binary file.
+def iter_pages(source, start=0, limit=None):
+    from pypdf import PdfReader  # imported on first parse, it is slow to import
+
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    total = len(reader.pages)
+    stop = total if limit is None else min(total, start + limit)
+    for number in range(start, stop):
+        yield reader.pages[number].extract_text(extraction_mode="plain").strip()
+
+
+# Page texts of an open binary file (e.g. the spooled file behind an upload), reusing earlier
+# extractions of the same bytes and page range. It is hashed and parsed in place, never
+# copied into one big bytes object
+def extract_pages_from_file(f, start=0, limit=None, use_cache=True, max_bytes=MAX_PDF_BYTES) -> list:
+    return _cached(stream_digest(f, max_bytes), f, start, limit, use_cache)
+
+
+def extract_pages_from_path(path: str, start=0, limit=None, use_cache=True) -> list:
+    if not os.path.exists(path):
+        raise FileNotFoundError("PDF file not found.")
+    return _cached(file_digest(path), path, start, limit, use_cache)
+
+
+def _cached(digest, source, start, limit, use_cache):
+    key = f"{digest}:{start}:{limit}"
+    if use_cache:
+        cached = page_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    pages = list(iter_pages(source, start, limit))
+    page_cache.set(key, json.dumps(pages))
+    return pages
@@ -0,0 +1,181 @@
+# storage/app/python/postprocess.py
+#
+# Shared post-processing of model output: removes **bold** / *italic* markers and
+# leading "*" / "-" bullets. Produces exactly what the original three-regex
+# clean_output produced, but in one left-to-right pass over the lines using plain
+# str methods (no regex, no backtracking), and it can be fed streamed chunks.
+
+
+# Remove paired markers in one line the way re.sub(r"\*\*(.*?)\*\*", r"\1", ...) does:
+# markers pair up left to right, so only the last one of an odd count stays
+def _strip_pairs(line: str, marker: str) -> str:
+    parts = line.split(marker)
+    if len(parts) % 2:
+        return "".join(parts)
+    return "".join(parts[:-1]) + marker + parts[-1]
+
+
+def strip_emphasis(line: str) -> str:
+    if "*" not in line:
+        return line
+    return _strip_pairs(_strip_pairs(line, "**"), "*")
+
+
+# Incremental cleaner for streamed responses.
+# Text is fed in arbitrary chunks; anything that could still be part of a marker
+# split across a chunk boundary is held back until the line settles. Joining
+# everything returned by feed() and flush() equals clean_output(full_text).
+class StreamCleaner:
+    def __init__(self):
+        self._parts = []          # raw pieces of the current, not yet terminated line
+        self._tail = ""           # start of the current line that has not been released yet
+        self._open = True         # the current line can still be released before it ends
+        self._released = 0        # characters already released for the current line
+        self._pending = ""        # whitespace waiting to see what the next line is
+        self._blank_lines = []    # whitespace-only lines held back before the next line
+        self._eat_space = False   # a bare bullet swallows the whitespace that follows it
+        self._started = False     # leading whitespace of the whole output is dropped
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        pos = 0
+        while True:
+            end = chunk.find("\n", pos)
+            if end == -1:
+                break
+            self._parts.append(chunk[pos:end])
+            out.append(self._finish())
+            pos = end + 1
+        rest = chunk[pos:]
+        if rest:
+            self._parts.append(rest)
+            if self._open:
+                out.append(self._partial(rest))
+        return "".join(out)
+
+    def flush(self) -> str:
+        return self._finish() if self._parts else ""
+
+    def _finish(self) -> str:
+        line = "".join(self._parts)
+        out = self._process(line)[self._released:]
+        self._parts = []
+        self._tail = ""
+        self._open = True
+        self._released = 0
+        return out
+
+    # Release the start of an unfinished line once it can no longer change:
+    # the line is known not to be blank or a bullet, and no '*' has been seen yet
+    def _partial(self, piece: str) -> str:
+        first = not self._released
+        self._tail += piece
+        if first:
+            head = self._tail.lstrip()
+            if not head:
+                return ""
+            if head[0] in "*-":
+                self._open = False
+                return ""
+            if self._eat_space or not self._started:
+                self._tail = head
+
+        star = self._tail.find("*")
+        if star != -1:
+            self._open = False
+        body = (self._tail if star == -1 else self._tail[:star]).rstrip()
+        self._tail = self._tail[len(body):]
+
+        out = body
+        if first:
+            out = (self._separator() if self._started else "") + body
+        self._released += len(out)
+        return out
+
+    def _separator(self) -> str:
+        return self._pending + "\n" + "".join(blank + "\n" for blank in self._blank_lines)
+
+    def _process(self, line: str) -> str:
+        text = strip_emphasis(line)
+        check_bullet = True
+
+        if self._eat_space:
+            stripped = text.lstrip()
+            if not stripped:
+                return ""
+            # Only a line that starts right at column 0 can still be a bullet
+            check_bullet = stripped == text
+            text = stripped
+            self._eat_space = False
+
+        stripped = text.lstrip()
+        if not stripped:
+            self._blank_lines.append(text)
+            return ""
+
+        if check_bullet and stripped[0] in "*-":
+            # A bullet also consumes the blank lines in front of it
+            self._blank_lines = []
+            text = stripped[1:].lstrip()
+            if not text:
+                self._eat_space = True
+                return ""
+
+        separator = ""
+        if not self._started:
+            text = text.lstrip()
+        else:
+            separator = self._separator()
+        self._blank_lines = []
+        self._started = True
+
+        body = text.rstrip()
+        self._pending = text[len(body):]
+        return separator + body
+
+
+# Function to clean the output from formatting artifacts.
+# Same line steps as StreamCleaner._process, kept in local variables because the whole
+# text is available (benchmarks/clean_bench.py checks both against the original regexes)
+def clean_output(text: str) -> str:
+    out = []
+    pending = ""
+    blank_lines = []
+    eat_space = False
+    started = False
+    for line in text.split("\n"):
+        if "*" in line:
+            line = strip_emphasis(line)
+        check_bullet = True
+        if eat_space:
+            stripped = line.lstrip()
+            if not stripped:
+                continue
+            check_bullet = len(stripped) == len(line)
+            line = stripped
+            eat_space = False
+
+        stripped = line.lstrip()
+        if not stripped:
+            blank_lines.append(line)
+            continue
+        if check_bullet and stripped[0] in "*-":
+            blank_lines = []
+            line = stripped[1:].lstrip()
+            if not line:
+                eat_space = True
+                continue
+
+        if not started:
+            line = line.lstrip()
+            started = True
+            blank_lines = []
+        else:
+            out.append(pending + "\n")
+            if blank_lines:
+                out.append("\n".join(blank_lines) + "\n")
+                blank_lines = []
+        body = line.rstrip()
+        pending = line[len(body):]
+        out.append(body)
+    return "".join(out)
@@ -0,0 +1,154 @@
+# storage/app/python/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Entries kept in memory (LRU) and how long any entry stays valid, in seconds
+CACHE_SIZE = int(os.getenv("TUTOR_CACHE_SIZE", "512"))
+CACHE_TTL = float(os.getenv("TUTOR_CACHE_TTL", "86400"))
+# Optional SQLite file for a second, persistent tier; empty disables it
+CACHE_DB = os.getenv("TUTOR_CACHE_DB", "")
+CACHE_DB_SIZE = int(os.getenv("TUTOR_CACHE_DB_SIZE", "20000"))
+
+
+# Content-addressed key: same model, same rendered prompt and same parameters
+# always produce the same key
+def make_key(model_name: str, prompt_text: str, params: dict) -> str:
+    payload = json.dumps([model_name, prompt_text, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Two-tier cache for finished generations: in-memory LRU in front of an optional SQLite table.
+# Async code uses aget/aset so the SQLite tier never runs on the event loop.
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, db_path=CACHE_DB, max_db_entries=CACHE_DB_SIZE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._db.commit()
+
+    def get(self, key: str):
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        self._set_disk(key, value, now)
+
+    # Same as get/set for async code: memory hits are answered at once and only the SQLite
+    # tier (a query, an update and a commit) runs in a worker thread, off the event loop
+    async def aget(self, key: str):
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self._db is None:
+            return self._get_disk(key)  # only counts the miss
+        return await asyncio.to_thread(self._get_disk, key)
+
+    async def aset(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, value, now)
+
+    def _get_memory(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if now - created > self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Looked up after a memory miss; counts the lookup as a disk hit or a miss
+    def _get_disk(self, key):
+        now = time.time()
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created = row
+                    if now - created <= self.ttl:
+                        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, value, created)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def _set_disk(self, key, value, now):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Drop expired rows and the least recently used ones beyond the size limit
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_db_entries,),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._db is not None,
+            }
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+response_cache = ResponseCache()
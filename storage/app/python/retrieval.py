@@ -0,0 +1,250 @@
+# storage/app/python/retrieval.py
+#
+# Retrieval over whole PDFs: a document is split into overlapping chunks once, the chunks
+# are embedded with a local Ollama embedding model, and the vectors are stored in SQLite
+# keyed by the document hash. A request then only sends the chunks closest to its
+# topic, so later chapters are reachable and the prompt stays small.
+# numpy is imported inside the functions that use it, so importing this module stays cheap.
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrency import run_in_pdf_pool
+from llm_registry import get_embeddings
+from metrics import stage
+from pdf_extract import iter_pages, source_digest
+
+# Retrieval is used for PDF requests with a topic or notes unless TUTOR_RAG=0 (then, and
+# for requests without either, the first pages are sent as before)
+RAG_ENABLED = os.getenv("TUTOR_RAG", "1") == "1"
+# Ollama embedding model, chunk size / overlap in characters, and chunks sent per request
+EMBED_MODEL = os.getenv("TUTOR_EMBED_MODEL", "nomic-embed-text")
+CHUNK_CHARS = int(os.getenv("TUTOR_RAG_CHUNK_CHARS", "1200"))
+CHUNK_OVERLAP = int(os.getenv("TUTOR_RAG_CHUNK_OVERLAP", "200"))
+TOP_K = int(os.getenv("TUTOR_RAG_TOP_K", "4"))
+# SQLite file holding the index; empty keeps it in memory for the life of the process
+INDEX_DB = os.getenv("TUTOR_RAG_DB", "")
+# Indexed documents kept at all; past that the least recently used are deleted (the default
+# is lower when the index lives in memory)
+INDEX_MAX_DOCS = int(os.getenv("TUTOR_RAG_MAX_DOCS", "1024" if INDEX_DB else "64"))
+# Indexed documents whose vectors stay loaded in memory
+INDEX_MEMORY = int(os.getenv("TUTOR_RAG_MEMORY_DOCS", "32"))
+# Texts sent to the embedding model per call
+EMBED_BATCH = int(os.getenv("TUTOR_EMBED_BATCH", "32"))
+# Seconds retrieval is skipped after the embedding model failed (e.g. it was never pulled):
+# PDF requests then go straight to the first-pages path instead of parsing the whole document
+EMBED_RETRY = float(os.getenv("TUTOR_EMBED_RETRY", "60"))
+
+
+class EmbeddingUnavailable(Exception):
+    pass
+
+
+# Split page texts into chunks of about `size` characters that overlap by `overlap`,
+# cutting at whitespace where possible. Returns (page number, text) pairs in document order.
+def chunk_pages(pages, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP) -> list:
+    chunks = []
+    for number, text in enumerate(pages):
+        text = " ".join(text.split())
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + size)
+            if end < len(text):
+                cut = text.rfind(" ", start + size // 2, end)
+                if cut != -1:
+                    end = cut
+            chunks.append((number, text[start:end].strip()))
+            if end == len(text):
+                break
+            start = max(end - overlap, start + 1)
+    return [(number, text) for number, text in chunks if text]
+
+
+# Chunks and unit-length vectors of indexed documents: SQLite on disk, recent ones in memory.
+# get() and add() write to SQLite, so async code calls them through asyncio.to_thread.
+class VectorIndex:
+    def __init__(self, db_path=INDEX_DB, memory_docs=INDEX_MEMORY, max_docs=INDEX_MAX_DOCS):
+        self.memory_docs = memory_docs
+        self.max_docs = max_docs
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "key TEXT PRIMARY KEY, dimensions INTEGER NOT NULL, chunks INTEGER NOT NULL, created REAL NOT NULL, "
+            "last_used REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(documents)")]
+        if "last_used" not in columns:  # index files written before documents were evicted
+            self._db.execute("ALTER TABLE documents ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "key TEXT NOT NULL, position INTEGER NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL, "
+            "vector BLOB NOT NULL, PRIMARY KEY (key, position))"
+        )
+        self._db.commit()
+
+    # (chunks, vectors) of a document, or None when it has not been indexed
+    def get(self, key: str):
+        import numpy as np
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                return entry
+            row = self._db.execute("SELECT dimensions FROM documents WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touch(key)
+            rows = self._db.execute(
+                "SELECT page, text, vector FROM chunks WHERE key = ? ORDER BY position", (key,)
+            ).fetchall()
+            chunks = [(page, text) for page, text, _ in rows]
+            vectors = np.frombuffer(b"".join(vector for _, _, vector in rows), dtype=np.float32).reshape(-1, row[0])
+            self._remember(key, (chunks, vectors))
+            return chunks, vectors
+
+    def add(self, key: str, chunks: list, vectors):
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._db.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            self._db.executemany(
+                "INSERT INTO chunks (key, position, page, text, vector) VALUES (?, ?, ?, ?, ?)",
+                [(key, i, page, text, vectors[i].tobytes()) for i, (page, text) in enumerate(chunks)],
+            )
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (key, dimensions, chunks, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, vectors.shape[1], len(chunks), now, now),
+            )
+            # Delete the least recently used documents beyond max_docs
+            stale = [row[0] for row in self._db.execute(
+                "SELECT key FROM documents ORDER BY last_used DESC LIMIT -1 OFFSET ?", (self.max_docs,)
+            )]
+            for old in stale:
+                self._db.execute("DELETE FROM chunks WHERE key = ?", (old,))
+                self._db.execute("DELETE FROM documents WHERE key = ?", (old,))
+                self._memory.pop(old, None)
+            self._db.commit()
+            self._remember(key, (chunks, vectors))
+
+    def _touch(self, key):
+        self._db.execute("UPDATE documents SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_docs:
+            self._memory.popitem(last=False)
+
+
+vector_index = VectorIndex()
+_indexing = {}  # document key -> task indexing it, so concurrent uploads of one file index it once
+_unembedded = OrderedDict()  # document key -> chunks parsed but not indexed because embedding failed
+_embed_failed_until = 0.0
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# Fail at once while an earlier embedding failure is remembered (for EMBED_RETRY seconds)
+def check_embedding():
+    if time.monotonic() < _embed_failed_until:
+        raise EmbeddingUnavailable(f"{EMBED_MODEL} failed recently; retrying in at most {EMBED_RETRY:.0f} s")
+
+
+async def embed_texts(texts: list):
+    global _embed_failed_until
+    check_embedding()
+    embeddings = get_embeddings(EMBED_MODEL)
+    batches = [texts[i:i + EMBED_BATCH] for i in range(0, len(texts), EMBED_BATCH)]
+    try:
+        results = await asyncio.gather(*(embeddings.aembed_documents(batch) for batch in batches))
+    except Exception:
+        _embed_failed_until = time.monotonic() + EMBED_RETRY
+        raise
+    return _normalize([vector for batch in results for vector in batch])
+
+
+def _read_chunks(source) -> list:
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return chunk_pages(iter_pages(source))
+
+
+# Chunks of a document whose embedding failed are kept, so a retry does not parse it again
+async def _build(key, chunks):
+    if not chunks:
+        await asyncio.to_thread(vector_index.add, key, [], [[0.0]])
+        return
+    try:
+        with stage("embed_chunks"):
+            vectors = await embed_texts([text for _, text in chunks])
+    except Exception:
+        _unembedded[key] = chunks
+        while len(_unembedded) > INDEX_MEMORY:
+            _unembedded.popitem(last=False)
+        raise
+    await asyncio.to_thread(vector_index.add, key, chunks, vectors)
+
+
+# Index a PDF (path, bytes or open binary file) unless it already is; returns its index key.
+# Raises EmbeddingUnavailable without reading the document while the embedding model is failing.
+async def index_document(source, max_bytes=None) -> str:
+    digest = await run_in_pdf_pool(source_digest, source, max_bytes)
+    key = f"{digest}:{EMBED_MODEL}:{CHUNK_CHARS}:{CHUNK_OVERLAP}"
+    if await asyncio.to_thread(vector_index.get, key) is not None:
+        return key
+    check_embedding()
+
+    task = _indexing.get(key)
+    if task is None:
+        # Each request parses its own source; only the embedding is shared, so the shared task
+        # never reads an upload that its request may close (e.g. when the client disconnects)
+        chunks = _unembedded.pop(key, None)
+        if chunks is None:
+            with stage("pdf_parse"):
+                chunks = await run_in_pdf_pool(_read_chunks, source)
+        task = _indexing.get(key)  # started by another request while this one was parsing
+        if task is None:
+            task = asyncio.ensure_future(_build(key, chunks))
+            _indexing[key] = task
+            task.add_done_callback(lambda _: _indexing.pop(key, None))
+    await asyncio.shield(task)
+    return key
+
+
+# Text of the `top_k` chunks closest to the query, in document order. Without a query the
+# opening chunks are used, which matches the old "first pages" behaviour.
+async def relevant_text(key: str, query: str, top_k=TOP_K) -> str:
+    import numpy as np
+
+    chunks, vectors = await asyncio.to_thread(vector_index.get, key)
+    if not chunks:
+        return ""
+    if not query.strip() or len(chunks) <= top_k:
+        chosen = range(min(top_k, len(chunks)))
+    else:
+        with stage("embed_query"):
+            query_vector = (await embed_texts([query]))[0]
+        scores = vectors @ query_vector
+        chosen = sorted(np.argpartition(-scores, top_k - 1)[:top_k])
+    return "\n\n".join(f"[page {chunks[i][0] + 1}] {chunks[i][1]}" for i in chosen)
+
+
+async def pdf_context(source, query: str, max_bytes=None, top_k=TOP_K) -> str:
+    key = await index_document(source, max_bytes)
+    return await relevant_text(key, query, top_k)
@@ -0,0 +1,249 @@
+# storage/app/python/sessions.py
+#
+# Multi-turn tutor sessions. The first turn is an ordinary tutor explanation; the session then
+# keeps the extracted document text and the conversation in memory, so a follow-up question is
+# answered without the topic or PDF being sent, parsed or explained again. Turns older than the
+# last few are folded into a rolling summary in the background, which keeps the prompt of a
+# follow-up about the same size however long the conversation gets.
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from fastapi import UploadFile
+from concurrency import generation_limiter
+from llm_registry import context_window, with_options
+from metrics import stage
+from postprocess import clean_output
+from token_budget import fit, trim_to_tokens
+from tutor_agent import generate_output, get_model, prepare_request, record_timings
+
+# Sessions kept at once (the least recently used go first) and how long an idle one lives (seconds)
+MAX_SESSIONS = int(os.getenv("TUTOR_MAX_SESSIONS", "1000"))
+SESSION_TTL = float(os.getenv("TUTOR_SESSION_TTL", "3600"))
+# Turns quoted word for word in a follow-up prompt (older ones are only in the summary), and
+# the most tokens kept of each quoted answer and of the session's document text. The defaults
+# keep a follow-up and its answer inside the model's window at the default OLLAMA_WARM_CTX
+# (4096); with a smaller window the budget trims the document text to make room.
+RECENT_TURNS = int(os.getenv("TUTOR_SESSION_RECENT_TURNS", "2"))
+TURN_TOKENS = int(os.getenv("TUTOR_SESSION_TURN_TOKENS", "400"))
+DOCUMENT_TOKENS = int(os.getenv("TUTOR_SESSION_DOCUMENT_TOKENS", "1500"))
+
+# Same layout as the tutor prompts: fixed instructions as the system message, then the parts
+# that change least (document, summary) before the ones that change every turn, so Ollama
+# can reuse the evaluated prefix between turns of a session.
+followup_instructions = """
+You are an experienced and friendly virtual tutor continuing a conversation with a student. You have already explained the topic below; the student now has a follow-up question.
+
+Answer the student's latest question clearly and at their grade level:
+- Build on what was already explained instead of repeating it; refer back to it briefly where it helps.
+- Use the study material when it is relevant to the question.
+- Use an analogy or a simple example when the student seems confused.
+- Keep the answer focused on the question.
+"""
+
+followup_template = """
+**Student Details:**
+- Grade Level: {grade_level}
+- Study Material: {document}
+
+**Conversation So Far (summary):**
+{summary}
+
+**Most Recent Exchanges:**
+{recent}
+
+**Student's Question:** {question}
+
+**Your Answer:**
+"""
+
+compact_instructions = """
+You keep short running notes of a tutoring conversation. Merge the earlier notes and the new exchanges into one summary that records what the student asked, what was explained, and anything they still find difficult. Write plain sentences, no headings, and keep it under 150 words.
+"""
+
+compact_template = """
+Earlier notes:
+{summary}
+
+New exchanges:
+{turns}
+"""
+
+_prompts = None
+
+# (followup_prompt, compact_prompt)
+def get_prompts():
+    global _prompts
+    if _prompts is None:
+        from langchain_core.prompts import ChatPromptTemplate
+        _prompts = (
+            ChatPromptTemplate.from_messages([("system", followup_instructions), ("human", followup_template)]),
+            ChatPromptTemplate.from_messages([("system", compact_instructions), ("human", compact_template)]),
+        )
+    return _prompts
+
+def load():
+    get_prompts()
+
+
+class Session:
+    def __init__(self, grade_level, document):
+        self.id = uuid.uuid4().hex
+        self.grade_level = grade_level
+        self.document = document
+        self.summary = ""
+        self.turns = []  # (question, answer) pairs not folded into the summary yet
+        self.count = 0
+        self.created = time.time()
+        self.last_used = self.created
+        self.lock = asyncio.Lock()  # one turn at a time
+        self.compaction = None
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append((question, answer))
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.id,
+            "grade_level": self.grade_level,
+            "turns": self.count,
+            "summary": self.summary,
+            "created": self.created,
+            "last_used": self.last_used,
+        }
+
+
+# In-memory sessions with LRU eviction and an idle timeout
+class SessionStore:
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def add(self, session: Session):
+        with self._lock:
+            self._expire(time.time())
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                self._close(oldest)
+                self.evicted += 1
+
+    def get(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl:
+                self._close(self._sessions.pop(session_id))
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._close(session)
+        return session
+
+    # Sessions are ordered by last use, so the expired ones are at the front
+    def _expire(self, now):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.ttl:
+                break
+            self._close(self._sessions.pop(session.id))
+
+    def _close(self, session):
+        if session.compaction is not None:
+            session.compaction.cancel()
+
+
+session_store = SessionStore()
+
+# Quoted exchanges for a prompt, each answer cut to TURN_TOKENS
+def format_turns(turns) -> str:
+    return "\n\n".join(f"Student: {question}\nTutor: {trim_to_tokens(answer, TURN_TOKENS)}" for question, answer in turns)
+
+# Run a session prompt within the token budget of `kind`; returns the model's message
+async def _generate(prompt, inputs, kind, field, timings=None):
+    inputs, budget = fit(prompt, inputs, kind, context_window(get_model().model), field=field)
+    if timings is not None:
+        timings["budget"] = budget
+    chain = prompt | with_options(get_model(), num_ctx=budget["num_ctx"], num_predict=budget["num_predict"])
+    async with generation_limiter.slot():
+        with stage("generation"):
+            result = await chain.ainvoke(inputs)
+    record_timings(result.response_metadata, timings)
+    return result
+
+# Fold every turn but the last RECENT_TURNS into the summary. On failure the turns are kept
+# and folded by the next compaction.
+async def compact(session: Session):
+    old = session.turns[:len(session.turns) - RECENT_TURNS]
+    if not old:
+        return
+    inputs = {"summary": session.summary or "(none yet)", "turns": format_turns(old)}
+    try:
+        with stage("session_compaction"):
+            result = await _generate(get_prompts()[1], inputs, "compact", "turns")
+    except Exception as e:
+        print(f"Session compaction failed, keeping the turns: {e}")
+        return
+    session.summary = result.content.strip()
+    del session.turns[:len(old)]
+
+# Start a session with the tutor's explanation of a topic or PDF (the same request as /tutor,
+# answered from the response cache when possible). Returns (session, output).
+async def start_session(grade_level, input_type, topic="", add_cont="", pdf_file: UploadFile = None, use_cache=True, timings=None):
+    prompt, user_input = await prepare_request(grade_level, input_type, topic, add_cont, pdf_file)
+    output = await generate_output(prompt, user_input, use_cache, timings)
+    if input_type == "pdf":
+        question = "Explain the core concepts of this material."
+    else:
+        question = f"Explain {topic}."
+    if add_cont:
+        question += f" ({add_cont})"
+
+    session = Session(grade_level, trim_to_tokens(user_input["topic"], DOCUMENT_TOKENS))
+    session.add_turn(question, output)
+    session_store.add(session)
+    return session, output
+
+# Answer a follow-up question in a session. The prompt holds the document, the summary and
+# the last RECENT_TURNS turns, so its size does not grow with the conversation; compaction
+# of older turns runs after the answer is returned and is awaited by the next turn.
+async def ask(session: Session, question: str, timings=None):
+    async with session.lock:
+        if session.compaction is not None:
+            # Shielded: a follow-up that is cancelled must not cancel the session's compaction
+            await asyncio.shield(session.compaction)
+            session.compaction = None
+
+        inputs = {
+            "grade_level": session.grade_level,
+            "document": session.document,
+            "summary": session.summary or "(none yet)",
+            "recent": format_turns(session.turns[max(0, len(session.turns) - RECENT_TURNS):]),
+            "question": question,
+        }
+        result = await _generate(get_prompts()[0], inputs, "followup", "document", timings)
+        with stage("clean_output"):
+            answer = clean_output(result.content)
+
+        session.add_turn(question, answer)
+        if len(session.turns) > RECENT_TURNS:
+            session.compaction = asyncio.ensure_future(compact(session))
+        return answer
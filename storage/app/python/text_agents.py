@@ -0,0 +1,447 @@
+# storage/app/python/text_agents.py
+#
+# The text leveler, rewriter, summarizer and proofreader that used to run as separate
+# interactive scripts (python/text_leveler.py, text_rewriter_agent.py, text_summarizer.py,
+# test2.py). They now run inside the tutor service and share its PDF extraction, Ollama
+# clients and generation limit; the scripts are thin clients of the endpoints in main.py.
+
+import asyncio
+import collections
+import difflib
+import os
+import re
+from contextlib import aclosing
+from fastapi import UploadFile
+from llm_registry import context_window, get_llm, with_options
+from metrics import stage
+from concurrency import MAX_IN_FLIGHT, generation_limiter, run_as_completed, run_in_pdf_pool
+from pdf_extract import MAX_PDF_BYTES, PDFTooLarge, extract_pages_from_file, iter_pages, parse_page_range
+from response_cache import CACHE_TTL, ResponseCache, make_key
+from token_budget import CHARS_PER_TOKEN, estimate_tokens, fit
+from tutor_agent import record_timings
+
+# Ollama model of each agent
+LEVELER_MODEL = os.getenv("TUTOR_LEVELER_MODEL", "llama3")
+REWRITER_MODEL = os.getenv("TUTOR_REWRITER_MODEL", "llama3")
+SUMMARY_MODEL = os.getenv("TUTOR_SUMMARY_MODEL", "gemma3:4b")
+PROOFREAD_MODEL = os.getenv("TUTOR_PROOFREAD_MODEL", "llama3.1")
+# Approximate prompt budget (in tokens) of one summary chunk; keeps every call inside the gemma3:4b context window
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+# Number of chunk summaries generated at the same time (still within the service-wide generation limit)
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+
+# Paragraphs proofread at the same time, the longest piece sent as one prompt (longer
+# paragraphs are split between sentences), and the per-paragraph result cache
+PROOFREAD_WORKERS = int(os.getenv("TUTOR_PROOFREAD_WORKERS", str(MAX_IN_FLIGHT)))
+PROOFREAD_CHUNK_CHARS = int(os.getenv("TUTOR_PROOFREAD_CHUNK_CHARS", "2000"))
+PROOFREAD_CACHE_SIZE = int(os.getenv("TUTOR_PROOFREAD_CACHE_SIZE", "4096"))
+PROOFREAD_CACHE_DB = os.getenv("TUTOR_PROOFREAD_CACHE_DB", "")
+# Variants of one document generated at the same time, and the most one request may ask for
+VARIANT_CONCURRENCY = int(os.getenv("TUTOR_VARIANT_CONCURRENCY", str(MAX_IN_FLIGHT)))
+MAX_VARIANTS = int(os.getenv("TUTOR_MAX_VARIANTS", "24"))
+# Whole documents explained section by section: the size of a section in tokens, how many
+# sections are generated ahead of the one being sent, and the largest PDF accepted (it is
+# read a page at a time, so memory does not grow with its length)
+SECTION_TOKENS = int(os.getenv("TUTOR_SECTION_TOKENS", "1500"))
+SECTION_LOOKAHEAD = int(os.getenv("TUTOR_SECTION_LOOKAHEAD", "2"))
+BOOK_MAX_PDF_BYTES = int(os.getenv("TUTOR_BOOK_MAX_PDF_BYTES", str(100 * 1024 * 1024)))
+
+LEARNING_SPEEDS = ("slow", "average", "fast")
+
+leveler_template = """
+You are an assistant who explains book content in a way suitable for the learner.
+
+Parameters:
+- Grade level: {grade_level}
+- Learning speed: {learning_speed}
+
+Task:
+Based on the input text below, provide a clear, detailed explanation that matches the learner's grade level and learning speed.
+
+Do NOT summarize the text. Instead, explain the content thoroughly, using examples or simple language if needed to make it easier to understand.
+
+Input text: "{context}"
+
+Respond ONLY with the explanation text (no extra text).
+"""
+
+rewriter_template = (
+    "You are an assistant who rewrites content to suit different types of learners.\n\n"
+    "Learner Type: {learner_type}\n"
+    "Task: Rewrite the following input text so that it is easier to understand for this learner type.\n\n"
+    "Input Text:\n{input_text}\n\n"
+    "Output only the rewritten version without any explanation or comments."
+)
+
+summary_template = """
+You are an intelligent and concise summarization assistant.
+
+Your task is to read the content below and generate a summary that follows the user's specific request.
+
+------------------------
+Content:
+{text}
+
+Summary Instructions:
+{conditions}
+------------------------
+
+Please follow the instructions carefully and provide only the summary.
+"""
+
+chunk_template = """
+You are summarizing one part of a longer document. Your summary will later be combined with the summaries of the other parts.
+
+------------------------
+Part {index} of {total}:
+{text}
+------------------------
+
+Keep the main ideas, definitions, names and numbers, especially anything needed for this final summary request: {conditions}
+
+Provide only the summary of this part.
+"""
+
+combine_template = """
+Below are summaries of consecutive parts of the same document, in order.
+
+------------------------
+{text}
+------------------------
+
+Merge them into one coherent summary without losing important points, keeping in mind this final summary request: {conditions}
+
+Provide only the merged summary.
+"""
+
+# One paragraph per call, and only the corrected text comes back: the list of changes is
+# computed here with a diff instead of being written out by the model
+proofread_instructions = """
+You are a professional proofreader. Proofread the paragraph you are given:
+1. Correct grammar errors
+2. Fix spelling mistakes
+3. Adjust punctuation
+4. Improve clarity while preserving the meaning
+
+Respond with the corrected paragraph only: no introduction, no quotes and no list of changes.
+If nothing needs correcting, repeat the paragraph unchanged.
+"""
+
+proofread_cache = ResponseCache(max_entries=PROOFREAD_CACHE_SIZE, ttl=CACHE_TTL, db_path=PROOFREAD_CACHE_DB)
+
+# Prompts are built on first use (or by load()), like the tutor's, so importing stays cheap
+_chains = None
+
+# name -> (prompt, model, budget kind, input that may be trimmed, answer restates that input).
+# The model options are bound per call from the token budget, so only the prompts are kept.
+def get_chains() -> dict:
+    global _chains
+    if _chains is None:
+        from langchain_core.prompts import ChatPromptTemplate
+        _chains = {
+            "level": (ChatPromptTemplate.from_template(leveler_template), LEVELER_MODEL, "level", "context", False),
+            "rewrite": (ChatPromptTemplate.from_template(rewriter_template), REWRITER_MODEL, "rewrite", "input_text", True),
+            "summary": (ChatPromptTemplate.from_template(summary_template), SUMMARY_MODEL, "summary", "text", False),
+            "summary_chunk": (ChatPromptTemplate.from_template(chunk_template), SUMMARY_MODEL, "summary", "text", False),
+            "summary_combine": (ChatPromptTemplate.from_template(combine_template), SUMMARY_MODEL, "summary", "text", False),
+            # Pieces are at most PROOFREAD_CHUNK_CHARS long, well inside the budget, so none is trimmed
+            "proofread": (
+                ChatPromptTemplate.from_messages([("system", proofread_instructions), ("human", "{paragraph}")]),
+                PROOFREAD_MODEL, "proofread", "paragraph", True,
+            ),
+        }
+        for _, model, _, _, _ in _chains.values():
+            get_llm(model, chat=True)
+    return _chains
+
+def load():
+    get_chains()
+
+# Add one generation's budget and Ollama counters to a request's usage totals
+def add_usage(usage: dict, budget: dict, stats: dict):
+    usage["calls"] = usage.get("calls", 0) + 1
+    for name in ("estimated_prompt_tokens", "trimmed_tokens"):
+        usage[name] = usage.get(name, 0) + budget[name]
+    for name in ("prompt_tokens", "eval_tokens"):
+        usage[name] = usage.get(name, 0) + (stats.get(name) or 0)
+    usage["num_ctx"] = max(usage.get("num_ctx", 0), budget["num_ctx"])
+
+# One generation under the service-wide limit, sized by the token budget of its kind
+# (see token_budget.fit). A `usage` dict passed in accumulates tokens across calls.
+async def run_chain(name: str, inputs: dict, usage=None) -> str:
+    prompt, model, kind, field, echo = get_chains()[name]
+    inputs, budget = fit(prompt, inputs, kind, context_window(model), field=field, echo=echo)
+    chain = prompt | with_options(get_llm(model, chat=True), num_ctx=budget["num_ctx"], num_predict=budget["num_predict"])
+    async with generation_limiter.slot():
+        with stage("generation"):
+            result = await chain.ainvoke(inputs)
+    stats = {}
+    record_timings(result.response_metadata, stats)
+    if usage is not None:
+        add_usage(usage, budget, stats)
+    return result.content.strip()
+
+# Page texts of an uploaded PDF ("3-10"-style page range, empty for all pages). The upload is
+# parsed in place on the PDF worker pool, through the same page cache as the tutor, and closed.
+async def read_upload(pdf_file: UploadFile, pages: str = "") -> list:
+    try:
+        if pdf_file.size is not None and pdf_file.size > MAX_PDF_BYTES:
+            raise PDFTooLarge(MAX_PDF_BYTES)
+        start, limit = parse_page_range(pages)
+        with stage("pdf_parse"):
+            return await run_in_pdf_pool(extract_pages_from_file, pdf_file.file, start, limit)
+    finally:
+        await pdf_file.close()
+
+# Explanation of the text at the learner's grade level and learning speed
+async def level_text(context: str, grade_level: str, learning_speed: str, usage=None) -> str:
+    return await run_chain("level", {"context": context, "grade_level": grade_level, "learning_speed": learning_speed}, usage)
+
+# The text rewritten for a slow, average or fast learner
+async def rewrite_text(text: str, level: str, usage=None) -> str:
+    if level not in LEARNING_SPEEDS:
+        raise ValueError("level must be 'slow', 'average' or 'fast'")
+    return await run_chain("rewrite", {"learner_type": f"{level} learner", "input_text": text}, usage)
+
+# Split text into paragraphs at blank lines (LF or CRLF), keeping the separators so the
+# corrected text has the original layout: returns [paragraph, separator, paragraph, ...]
+def split_paragraphs(text: str) -> list:
+    return re.split(r"(\r?\n[ \t]*\r?\n\s*)", text)
+
+# A paragraph longer than `size` characters is proofread in sentence-aligned pieces.
+# Returns (pieces, separators), separators[i] being the whitespace the paragraph had between
+# pieces i and i + 1, so the corrected pieces are joined back with its own line breaks.
+def _paragraph_pieces(paragraph: str, size: int):
+    if len(paragraph) <= size:
+        return [paragraph], []
+    parts = re.split(r"(?<=[.!?])(\s+)", paragraph)
+    pieces = []
+    separators = []
+    current = parts[0]
+    for separator, sentence in zip(parts[1::2], parts[2::2]):
+        if len(current) + len(separator) + len(sentence) > size:
+            pieces.append(current)
+            separators.append(separator)
+            current = sentence
+        else:
+            current += separator + sentence
+    pieces.append(current)
+    return pieces, separators
+
+def _paragraph_key(paragraph: str) -> str:
+    return make_key(PROOFREAD_MODEL, proofread_instructions + paragraph, {})
+
+# Word-level differences between two versions of a paragraph
+def diff_words(original: str, corrected: str, paragraph: int) -> list:
+    before = original.split()
+    after = corrected.split()
+    changes = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, before, after, autojunk=False).get_opcodes():
+        if tag != "equal":
+            changes.append({
+                "paragraph": paragraph,
+                "type": tag,
+                "original": " ".join(before[i1:i2]),
+                "corrected": " ".join(after[j1:j2]),
+            })
+    return changes
+
+# Proofread text paragraph by paragraph. Paragraphs are corrected concurrently, and each one
+# is cached by its content, so resubmitting an edited essay only sends the changed paragraphs.
+# Returns {"output": corrected text, "changes": [...], "paragraphs": n, "reused": cached paragraphs,
+# "usage": token totals of the model calls}.
+async def proofread_text(text: str, workers: int = PROOFREAD_WORKERS) -> dict:
+    usage = {}
+    parts = split_paragraphs(text)
+    paragraphs = {i: parts[i].strip() for i in range(0, len(parts), 2) if parts[i].strip()}
+
+    pieces = {piece for paragraph in paragraphs.values() for piece in _paragraph_pieces(paragraph, PROOFREAD_CHUNK_CHARS)[0]}
+    corrected = {}
+    for piece in pieces:
+        cached = await proofread_cache.aget(_paragraph_key(piece))
+        if cached is not None:
+            corrected[piece] = cached
+    reused_pieces = set(corrected)
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def run(piece):
+        async with semaphore:
+            output = await run_chain("proofread", {"paragraph": piece}, usage)
+        # An empty answer is treated as "no corrections" rather than deleting the paragraph
+        corrected[piece] = output or piece
+        await proofread_cache.aset(_paragraph_key(piece), corrected[piece])
+
+    await asyncio.gather(*(run(piece) for piece in pieces if piece not in corrected))
+
+    changes = []
+    reused = 0
+    for number, (index, paragraph) in enumerate(paragraphs.items(), start=1):
+        pieces, separators = _paragraph_pieces(paragraph, PROOFREAD_CHUNK_CHARS)
+        new = "".join(corrected[piece] + separator for piece, separator in zip(pieces, separators + [""]))
+        reused += all(piece in reused_pieces for piece in pieces)
+        changes.extend(diff_words(paragraph, new, number))
+        leading = parts[index][:len(parts[index]) - len(parts[index].lstrip())]
+        trailing = parts[index][len(parts[index].rstrip()):]
+        parts[index] = leading + new + trailing
+    return {"output": "".join(parts), "changes": changes, "paragraphs": len(paragraphs), "reused": reused, "usage": usage}
+
+# Generate several variants of one document, e.g. a rewrite per learning speed. `run(**variant)`
+# produces one; at most `concurrency` run at once, and (index, output, error) is yielded as each finishes.
+async def generate_variants(variants: list, run, concurrency=VARIANT_CONCURRENCY):
+    async def one(variant):
+        return await run(**variant)
+
+    results = run_as_completed(enumerate(variants), one, min(concurrency, VARIANT_CONCURRENCY))
+    async with aclosing(results):
+        async for result in results:
+            yield result
+
+# Break a piece of text that is over budget at line breaks, or hard-wrap it as a last resort
+def _split_oversized(text: str, budget: int) -> list:
+    if estimate_tokens(text) <= budget:
+        return [text]
+    lines = text.split("\n")
+    if len(lines) == 1:
+        width = budget * CHARS_PER_TOKEN
+        return [text[i:i + width] for i in range(0, len(text), width)]
+    pieces = []
+    for line in lines:
+        pieces.extend(_split_oversized(line, budget))
+    return pieces
+
+# Greedily pack pages (or partial summaries) into chunks of about `budget` tokens, keeping their order
+def split_into_chunks(pieces: list, budget: int = CHUNK_TOKENS, separator: str = "\n") -> list:
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        for part in _split_oversized(piece, budget):
+            tokens = estimate_tokens(part)
+            if current and size + tokens > budget:
+                chunks.append(separator.join(current))
+                current, size = [], 0
+            current.append(part)
+            size += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+# Position of a section as a "resume" cursor: "section:page:part", the page 1-based
+def format_cursor(section: int, page: int, part: int) -> str:
+    return f"{section}:{page + 1}:{part}"
+
+def parse_cursor(text: str):
+    try:
+        section, page, part = (int(value) for value in text.split(":"))
+    except ValueError:
+        raise ValueError("resume must be the cursor of a section") from None
+    if section < 1 or page < 1 or part < 0:
+        raise ValueError("resume must be the cursor of a section")
+    return section, page - 1, part
+
+# Pack page texts, read lazily, into sections of about `budget` tokens; a page longer than that
+# is split at line breaks into several parts. `start` is the (section, page, part) to begin at,
+# and `pages` yields the texts from that page on. Yields {"section", "pages": [first, last]
+# (1-based), "text", "resume": cursor of the next section}.
+def iter_sections(pages, start=(1, 0, 0), budget: int = SECTION_TOKENS):
+    number, first_page, first_part = start
+    current, size, begin, end = [], 0, None, None
+    page = first_page - 1
+    for page, text in enumerate(pages, start=first_page):
+        parts = _split_oversized(text, budget) if text else []
+        for part, piece in enumerate(parts):
+            if page == first_page and part < first_part:
+                continue
+            tokens = estimate_tokens(piece)
+            if current and size + tokens > budget:
+                yield {"section": number, "pages": [begin + 1, end + 1], "text": "\n".join(current),
+                       "resume": format_cursor(number + 1, page, part)}
+                number, current, size = number + 1, [], 0
+            if not current:
+                begin = page
+            current.append(piece)
+            size += tokens
+            end = page
+    if current:
+        yield {"section": number, "pages": [begin + 1, end + 1], "text": "\n".join(current),
+               "resume": format_cursor(number + 1, page + 1, 0)}
+
+# Sections of plain text, or of a PDF (path or open file) within a "3-10"-style page range,
+# continuing from a "resume" cursor if one is given. Nothing is read until the first section
+# is asked for.
+def open_sections(source, pages: str = "", resume: str = ""):
+    start = parse_cursor(resume) if resume else None
+    if isinstance(source, str):
+        section, page, part = start or (1, 0, 0)
+        return iter_sections(iter([source][page:]), (section, page, part))
+    first, limit = parse_page_range(pages)
+    section, page, part = start or (1, first, 0)
+    page = max(page, first)
+    if limit is not None:
+        limit = max(0, first + limit - page)
+    return iter_sections(iter_pages(source, page, limit), (section, page, part))
+
+# Explain the sections of open_sections() in document order. Up to `lookahead` sections are
+# generated ahead of the one being waited for, and a section is only read (its PDF pages only
+# parsed) once it is scheduled, so the first one is sent early and memory stays flat. Yields each
+# section, without its text, with "output" and "usage" as soon as it and all before it are done;
+# a failed section is yielded with "error" and ends the run, so resuming starts from it.
+async def level_sections(sections, grade_level: str, learning_speed: str, lookahead: int = SECTION_LOOKAHEAD):
+    lookahead = max(0, min(lookahead, SECTION_LOOKAHEAD))
+    pending = collections.deque()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) <= lookahead:
+                with stage("pdf_parse"):
+                    section = await run_in_pdf_pool(next, sections, None)
+                if section is None:
+                    exhausted = True
+                    break
+                usage = {}
+                task = asyncio.ensure_future(level_text(section.pop("text"), grade_level, learning_speed, usage))
+                pending.append((section, task, usage))
+            if not pending:
+                return
+            section, task, usage = pending.popleft()
+            try:
+                output = await task
+            except Exception as e:
+                yield {**section, "error": str(e) or type(e).__name__}
+                return
+            yield {**section, "output": output, "usage": usage}
+    finally:
+        for _, task, _ in pending:
+            task.cancel()
+
+# Map-reduce summary of a document of any length
+async def summarize_pages(pages: list, conditions: str, workers: int = SUMMARY_WORKERS, chunk_tokens: int = CHUNK_TOKENS, usage=None) -> str:
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(name, inputs):
+        async with semaphore:
+            return await run_chain(name, inputs, usage)
+
+    chunks = split_into_chunks(pages, chunk_tokens)
+    if not chunks:
+        return ""
+    if len(chunks) == 1:
+        return await run("summary", {"text": chunks[0], "conditions": conditions})
+
+    # Map: summarize every chunk concurrently
+    partials = await asyncio.gather(*(
+        run("summary_chunk", {"text": chunk, "index": i + 1, "total": len(chunks), "conditions": conditions})
+        for i, chunk in enumerate(chunks)
+    ))
+
+    # Reduce: merge neighbouring summaries level by level until they fit in one prompt
+    while True:
+        groups = split_into_chunks(partials, chunk_tokens, separator="\n\n")
+        if len(groups) == 1:
+            return await run("summary", {"text": groups[0], "conditions": conditions})
+        if len(groups) >= len(partials):
+            # Summaries are too long to pack by budget; merge them pairwise so every level shrinks
+            groups = ["\n\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+        partials = await asyncio.gather(*(
+            run("summary_combine", {"text": group, "conditions": conditions}) for group in groups
+        ))
@@ -0,0 +1,89 @@
+# storage/app/python/token_budget.py
+#
+# Token budgets for generations: the prompt is measured, the variable part of it (PDF
+# text, a document to rewrite, ...) is trimmed when prompt and answer would not fit in the
+# model's context window, and each call gets an output cap (num_predict). The window itself
+# (num_ctx) is fixed per model (llm_registry.context_window): Ollama reloads a model and
+# drops its cached prompt prefix whenever num_ctx changes, so it is never sized per request.
+#
+# Tokens are estimated from the text length (no tokenizer is loaded); a safety margin
+# covers the estimate's error.
+
+import math
+import os
+
+# Rough characters-per-token ratio used to size prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+# Fraction added to every estimate to cover tokenizer differences
+TOKEN_MARGIN = float(os.getenv("TUTOR_TOKEN_MARGIN", "0.1"))
+
+# Output caps (num_predict) per kind of request
+PREDICT_LIMITS = {
+    "tutor": int(os.getenv("TUTOR_PREDICT_TUTOR", "1536")),
+    "level": int(os.getenv("TUTOR_PREDICT_LEVEL", "1536")),
+    "rewrite": int(os.getenv("TUTOR_PREDICT_REWRITE", "2048")),
+    "summary": int(os.getenv("TUTOR_PREDICT_SUMMARY", "768")),
+    "proofread": int(os.getenv("TUTOR_PREDICT_PROOFREAD", "1024")),
+    "followup": int(os.getenv("TUTOR_PREDICT_FOLLOWUP", "768")),
+    "compact": int(os.getenv("TUTOR_PREDICT_COMPACT", "256")),
+}
+# Answers that restate their input (rewrites, proofreading) get this many tokens per input
+# token on top of a small floor, instead of the full cap
+ECHO_RATIO = 1.3
+ECHO_FLOOR = 64
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _with_margin(tokens: int) -> int:
+    return math.ceil(tokens * (1 + TOKEN_MARGIN))
+
+
+# Cut text to about `tokens` tokens, at a word boundary where possible
+def trim_to_tokens(text: str, tokens: int) -> str:
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", limit // 2, limit)
+    return text[:cut if cut != -1 else limit]
+
+
+# Fit one call into a context window of num_ctx tokens. `prompt` is a langchain prompt
+# template and inputs[field] is the part that may be trimmed (None: nothing may be). kind
+# selects the num_predict cap; echo=True sizes the answer from the length of inputs[field] instead.
+# Returns (inputs, budget) where budget holds num_ctx, num_predict, the prompt estimate
+# and how many tokens were trimmed.
+def fit(prompt, inputs: dict, kind: str, num_ctx: int, field: str = None, echo: bool = False):
+    cap = PREDICT_LIMITS[kind]
+    context = inputs.get(field, "") if field else ""
+    fixed = estimate_tokens(prompt.format(**{**inputs, field: ""})) if field else estimate_tokens(prompt.format(**inputs))
+    context_tokens = estimate_tokens(context) if context else 0
+
+    def answer(tokens):
+        return min(cap, ECHO_FLOOR + math.ceil(ECHO_RATIO * tokens)) if echo else cap
+
+    # Room for the variable part: the window minus the margin, the fixed prompt and its answer
+    room = int(num_ctx / (1 + TOKEN_MARGIN)) - fixed
+    trimmed = 0
+    if context_tokens + answer(context_tokens) > room:
+        allowed = room - cap
+        if echo:
+            allowed = max(allowed, int((room - ECHO_FLOOR) / (1 + ECHO_RATIO)))
+        allowed = max(0, allowed)
+        if context_tokens > allowed and field:
+            context = trim_to_tokens(context, allowed)
+            trimmed = context_tokens - estimate_tokens(context)
+            context_tokens = estimate_tokens(context)
+            inputs = {**inputs, field: context}
+
+    prompt_tokens = fixed + context_tokens
+    # Without anything to trim, a prompt over the budget still runs; the answer gets what is left
+    num_predict = max(ECHO_FLOOR, min(answer(context_tokens), int(num_ctx / (1 + TOKEN_MARGIN)) - prompt_tokens))
+    return inputs, {
+        "num_ctx": num_ctx,
+        "num_predict": num_predict,
+        "estimated_prompt_tokens": prompt_tokens,
+        "trimmed_tokens": trimmed,
+    }
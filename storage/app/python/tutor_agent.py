@@ -1,16 +1,25 @@
 # storage/app/python/tutor_agent.py
 
+import json
 import os
-import re
+import time
+from contextlib import aclosing
 from pydantic import BaseModel, ValidationError
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.document_loaders import PyPDFLoader
 from fastapi import UploadFile
-import tempfile, os, re
+from llm_registry import context_window, get_llm, with_options
+from metrics import observe_generation, record, stage
+from concurrency import MAX_IN_FLIGHT, generation_limiter, iterate_detached, run_as_completed, run_in_pdf_pool
+from pdf_extract import MAX_PDF_BYTES, PDFTooLarge, extract_pages_from_file, extract_pages_from_path
+from postprocess import StreamCleaner, clean_output
+from retrieval import RAG_ENABLED, EmbeddingUnavailable, pdf_context
+from response_cache import make_key, response_cache
+from token_budget import fit
 
-# Define your prompt templates
-manual_topic_template = """
+# Define your prompt templates.
+# The fixed instructions go first, as the system message, and only the student details
+# change between requests: Ollama keeps the evaluated prefix of a loaded model and only
+# evaluates what differs from the previous prompt, so each call pays for the details alone.
+manual_topic_instructions = """
 You are an experienced and friendly virtual tutor, specializing in guiding students towards deep conceptual understanding. Your goal is to explain the given topic clearly and comprehensively, ensuring the student grasps the core ideas, their significance, and how they relate to broader concepts.
 
 Please structure your explanation as follows:
@@ -34,7 +43,9 @@ Please structure your explanation as follows:
 
 
 Important: Don't ask for a follow-up question.
----
+"""
+
+manual_topic_template = """
 Student Details:
 - Grade Level: {grade_level}
 - Topic: {topic}
@@ -43,7 +54,7 @@ Student Details:
 **Your Output (following the structure above):**
 """
 
-pdf_topic_template = """
+pdf_topic_instructions = """
 You are a knowledgeable and supportive virtual tutor, specializing in guiding students towards deep conceptual understanding based on provided text. Your goal is to explain the core concepts from the extracted content clearly and comprehensively, ensuring the student grasps the main ideas, their significance, and how they relate to broader concepts discussed in the text.
 
 Please structure your explanation as follows:
@@ -67,20 +78,58 @@ Please structure your explanation as follows:
 
 
 Important: Don't ask for a follow-up question.
+"""
 
----
+pdf_topic_template = """
 **Student Details:**
 - Grade Level: {grade_level}
-- Extracted Content (first 2 pages): {topic}
+- Extracted Content: {topic}
 - Additional Notes: {add_cont}
 
 **Your Output (following the structure above):**
 """
 
-# Initialize your language model and prompt templates
-model = OllamaLLM(model="gemma3")
-manual_prompt = ChatPromptTemplate.from_template(manual_topic_template)
-pdf_prompt = ChatPromptTemplate.from_template(pdf_topic_template)
+# Model settings that change the generated text and therefore belong in the cache key
+GENERATION_PARAMS = ("temperature", "top_p", "top_k", "num_ctx", "num_predict", "seed", "stop")
+
+# The language model and prompt templates are built on first use (or by load()) rather than
+# at import: langchain is most of the service's startup time
+_model = None
+_prompts = None
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = get_llm("gemma3", chat=True)
+    return _model
+
+# (manual_prompt, pdf_prompt)
+def get_prompts():
+    global _prompts
+    if _prompts is None:
+        from langchain_core.prompts import ChatPromptTemplate
+        _prompts = (
+            ChatPromptTemplate.from_messages([("system", manual_topic_instructions), ("human", manual_topic_template)]),
+            ChatPromptTemplate.from_messages([("system", pdf_topic_instructions), ("human", pdf_topic_template)]),
+        )
+    return _prompts
+
+# Explicit warm-up: do the deferred imports and construction now instead of in the first request
+def load():
+    import pypdf  # noqa: F401
+    get_prompts()
+    get_model()
+
+# Page window of an uploaded PDF that goes into the prompt
+PDF_START_PAGE = int(os.getenv("TUTOR_PDF_START_PAGE", "0"))
+PDF_PAGES = int(os.getenv("TUTOR_PDF_PAGES", "2"))
+# Directory that the pdf_path of a batch item must be inside (e.g. Laravel's storage/app);
+# empty means no server-side path is accepted and PDFs have to be uploaded
+PDF_ROOT = os.getenv("TUTOR_PDF_ROOT", "")
+# Items of one /tutor/batch call that are worked on at the same time (a client may ask for
+# fewer), and the most items one call may send
+BATCH_CONCURRENCY = int(os.getenv("TUTOR_BATCH_CONCURRENCY", str(MAX_IN_FLIGHT)))
+MAX_BATCH_ITEMS = int(os.getenv("TUTOR_MAX_BATCH_ITEMS", "100"))
 
 # Pydantic model used for input validation
 class TutorInput(BaseModel):
@@ -90,35 +139,72 @@ class TutorInput(BaseModel):
     pdf_path: str = ""
     add_cont: str = ""
 
-# Function to extract text from PDF (using only the first 2 pages)
+# Body of /tutor/batch; items are validated one by one so a bad item only fails itself
+class BatchInput(BaseModel):
+    items: list[dict]
+    concurrency: int = BATCH_CONCURRENCY
+    bypass_cache: bool = False
+
+# Function to extract text from PDF (only the first PDF_PAGES pages are parsed)
 def extract_text_from_pdf(path: str) -> str:
-    if not os.path.exists(path):
-        raise FileNotFoundError("PDF file not found.")
-    loader = PyPDFLoader(path)
-    pages = loader.load()
-    return " ".join([page.page_content for page in pages[:2]])
-
-# Function to clean the output from formatting artifacts
-def clean_output(text: str) -> str:
-    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
-    text = re.sub(r"\*(.*?)\*", r"\1", text)
-    text = re.sub(r"^\s*[\*\-]\s*", "", text, flags=re.MULTILINE)
-    return text.strip()
+    pages = extract_pages_from_path(path, PDF_START_PAGE, PDF_PAGES)
+    return " ".join(pages)
 
-# Main function containing the tutor logic
-async def generate_output_with_file(grade_level, input_type, topic="", add_cont="", pdf_file: UploadFile = None):
+# Same as extract_text_from_pdf, for the open file behind an upload (read in place, size-capped)
+def extract_text_from_file(f) -> str:
+    pages = extract_pages_from_file(f, PDF_START_PAGE, PDF_PAGES)
+    return " ".join(pages)
+
+# Resolve a client-supplied PDF path, refusing anything that ends up outside PDF_ROOT
+# (after "..", symlinks and absolute paths are resolved)
+def resolve_pdf_path(path: str) -> str:
+    if not PDF_ROOT:
+        raise ValueError("pdf_path is not accepted by this server; upload the PDF instead")
+    root = os.path.realpath(PDF_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError("pdf_path is outside the allowed PDF directory")
+    return resolved
+
+# PDF text for the prompt (source is a path or an open upload file): the indexed chunks most
+# relevant to the query, or the first PDF_PAGES pages when there is no query, retrieval is
+# off or the embedding model cannot be reached. Without a query retrieval could only pick
+# the opening chunks, so the document is not indexed for it.
+async def pdf_text(source, query: str) -> str:
+    if RAG_ENABLED and query.strip():
+        try:
+            return await pdf_context(source, query, MAX_PDF_BYTES)
+        except (PDFTooLarge, FileNotFoundError):
+            raise
+        except EmbeddingUnavailable:
+            pass  # the failure was reported when it happened
+        except Exception as e:
+            print(f"PDF retrieval failed, sending the first pages instead: {e}")
+
+    # Parse on the PDF worker pool so other requests keep being served
+    extract = extract_text_from_pdf if isinstance(source, str) else extract_text_from_file
+    with stage("pdf_parse"):
+        return await run_in_pdf_pool(extract, source)
+
+# Extract the PDF (an upload, or a file already on this server) and pick the prompt for this request.
+# For PDFs the topic and additional context select which parts of the document are sent.
+async def prepare_request(grade_level, input_type, topic="", add_cont="", pdf_file: UploadFile = None, pdf_path=""):
     if input_type == "pdf":
-        # Save PDF temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await pdf_file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        topic = extract_text_from_pdf(tmp_path)
-        os.unlink(tmp_path)  # Delete file after use
-        prompt = pdf_prompt
+        query = f"{topic}\n{add_cont}".strip()
+        if pdf_file is not None:
+            # The upload is parsed straight from its spooled file (memory up to 1 MB, disk
+            # beyond that) and closed afterwards, so its temp file never outlives the request
+            try:
+                if pdf_file.size is not None and pdf_file.size > MAX_PDF_BYTES:
+                    raise PDFTooLarge(MAX_PDF_BYTES)
+                topic = await pdf_text(pdf_file.file, query)
+            finally:
+                await pdf_file.close()
+        else:
+            topic = await pdf_text(resolve_pdf_path(pdf_path), query)
+        prompt = get_prompts()[1]  # pdf_prompt
     else:
-        prompt = manual_prompt
+        prompt = get_prompts()[0]  # manual_prompt
 
     user_input = {
         "grade_level": grade_level,
@@ -127,7 +213,150 @@ async def generate_output_with_file(grade_level, input_type, topic="", add_cont=
         "pdf_path": "",
         "add_cont": add_cont
     }
+    return prompt, user_input
+
+# Token budget of a prepared request: for PDFs the extracted text is trimmed to what fits
+# next to the instructions and the answer. Returns (user_input, budget).
+def budget_request(prompt, user_input):
+    num_ctx = context_window(get_model().model)
+    return fit(prompt, user_input, "tutor", num_ctx, field="topic" if user_input["input_type"] == "pdf" else None)
+
+# Cache key for a prepared request: model, fully rendered prompt and generation parameters
+def cache_key(prompt, user_input, budget=None) -> str:
+    model = get_model()
+    params = {name: getattr(model, name) for name in GENERATION_PARAMS}
+    if budget is not None:
+        params.update(num_ctx=budget["num_ctx"], num_predict=budget["num_predict"])
+    with stage("prompt_render"):
+        text = prompt.format(**user_input)
+    return make_key(model.model, text, params)
+
+# Token counts and durations (ms) Ollama reports with the last message of a generation.
+# prompt_eval_ms is the part spent reading the prompt; it drops once the system prefix is reused.
+def prompt_timings(metadata: dict) -> dict:
+    def ms(name):
+        value = metadata.get(name)
+        return round(value / 1e6, 1) if value is not None else None
+
+    return {
+        "prompt_tokens": metadata.get("prompt_eval_count"),
+        "prompt_eval_ms": ms("prompt_eval_duration"),
+        "eval_tokens": metadata.get("eval_count"),
+        "eval_ms": ms("eval_duration"),
+        "load_ms": ms("load_duration"),
+        "total_ms": ms("total_duration"),
+    }
+
+# Feed Ollama's counters of a finished generation into the metrics (and `timings`, if given)
+def record_timings(metadata: dict, timings=None):
+    stats = prompt_timings(metadata)
+    observe_generation(
+        stats["prompt_tokens"],
+        stats["prompt_eval_ms"] / 1000 if stats["prompt_eval_ms"] is not None else None,
+        stats["eval_tokens"],
+        stats["eval_ms"] / 1000 if stats["eval_ms"] is not None else None,
+    )
+    if timings is not None:
+        timings.update(stats)
+
+# Main function containing the tutor logic
+async def generate_output_with_file(grade_level, input_type, topic="", add_cont="", pdf_file: UploadFile = None, use_cache=True, timings=None):
+    prompt, user_input = await prepare_request(grade_level, input_type, topic, add_cont, pdf_file)
+    return await generate_output(prompt, user_input, use_cache, timings)
+
+# Run a prepared request; with use_cache=False the cache is not read but still refreshed.
+# A `timings` dict passed in is filled with the token budget and the prompt_timings() of the generation.
+async def generate_output(prompt, user_input, use_cache=True, timings=None):
+    user_input, budget = budget_request(prompt, user_input)
+    if timings is not None:
+        timings["budget"] = budget
+    key = cache_key(prompt, user_input, budget)
+    if use_cache:
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            if timings is not None:
+                timings["cached"] = True
+            return cached
+
+    chain = prompt | with_options(get_model(), num_ctx=budget["num_ctx"], num_predict=budget["num_predict"])
+    async with generation_limiter.slot():
+        with stage("generation"):
+            result = await chain.ainvoke(user_input)
+    record_timings(result.response_metadata, timings)
+    with stage("clean_output"):
+        output = clean_output(result.content)
+    await response_cache.aset(key, output)
+    return output
+
+# Streaming variant: yields cleaned text pieces as the model produces tokens
+# (`timings` is filled in once the stream is finished)
+async def stream_output(prompt, user_input, use_cache=True, timings=None):
+    user_input, budget = budget_request(prompt, user_input)
+    if timings is not None:
+        timings["budget"] = budget
+    key = cache_key(prompt, user_input, budget)
+    if use_cache:
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            if timings is not None:
+                timings["cached"] = True
+            yield cached
+            return
+
+    chain = prompt | with_options(get_model(), num_ctx=budget["num_ctx"], num_predict=budget["num_predict"])
+    cleaner = StreamCleaner()
+    pieces = []
+    async with generation_limiter.slot():
+        started = time.perf_counter()
+        first = True
+        # When the client goes away this generator is closed or cancelled, and the model stream
+        # with it, so the connection to Ollama is dropped and it stops generating
+        async with aclosing(iterate_detached(chain.astream(user_input))) as chunks:
+            async for chunk in chunks:
+                if first:
+                    record("first_token", time.perf_counter() - started)
+                    first = False
+                if chunk.response_metadata.get("done"):
+                    record_timings(chunk.response_metadata, timings)
+                piece = cleaner.feed(chunk.content)
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+        record("generation", time.perf_counter() - started)
+    tail = cleaner.flush()
+    if tail:
+        pieces.append(tail)
+        yield tail
+    await response_cache.aset(key, "".join(pieces))
+
+# Run many tutor requests with bounded concurrency, yielding (indices, output, error) as each finishes.
+# Identical items are generated once and reported for every index that asked for them.
+async def generate_batch(items, concurrency=BATCH_CONCURRENCY, use_cache=True):
+    groups = {}
+    for index, raw in enumerate(items):
+        try:
+            item = TutorInput(**raw)
+            if item.input_type not in ("topic", "pdf"):
+                raise ValueError("input_type must be 'topic' or 'pdf'")
+        except (ValidationError, ValueError, TypeError) as e:
+            yield [index], None, str(e)
+            continue
+        key = json.dumps(item.model_dump(), sort_keys=True)
+        groups.setdefault(key, (item, []))[1].append(index)
+
+    async def run(item):
+        prompt, user_input = await prepare_request(
+            item.grade_level, item.input_type, item.topic, item.add_cont, pdf_path=item.pdf_path
+        )
+        return await generate_output(prompt, user_input, use_cache)
+
+    results = run_as_completed(((indices, item) for item, indices in groups.values()), run, min(concurrency, BATCH_CONCURRENCY))
+    async with aclosing(results):
+        async for result in results:
+            yield result
 
-    chain = prompt | model
-    result = chain.invoke(user_input)
-    return clean_output(result)
+# Job handler for the background queue: the payload is a prepared user_input
+async def run_job(user_input):
+    manual_prompt, pdf_prompt = get_prompts()
+    prompt = pdf_prompt if user_input["input_type"] == "pdf" else manual_prompt
+    return await generate_output(prompt, user_input)